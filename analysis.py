@@ -20,6 +20,19 @@ class State:
 
     warnings: Dict[grammar.Expr, List[str]] = defaultdict(list)
 
+    def __init__(self) -> None:
+        self.syms_nullable = {}
+        self.syms_first = {}
+        self.syms_follow = {}
+        self.ancestors = []
+        self.terms = set()
+        self.nonterms = set()
+        self.nullable = {}
+        self.first = {}
+        self.follow = {}
+        self.predict = {}
+        self.warnings = defaultdict(list)
+
 
 def noop(self: grammar.Expr, x: Any) -> None:
     assert x == x
@@ -0,0 +1,81 @@
+import dataclasses
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import tempfile
+from types import CodeType
+from typing import Optional
+
+from .create import Options
+from . import pgo
+
+
+def generator_version() -> str:
+    # rdgen has no release numbers, so the generator is identified by its
+    # own source (and the bytecode format of the running interpreter)
+    h = hashlib.sha256(importlib.util.MAGIC_NUMBER)
+    directory: str = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as f:
+                h.update(name.encode())
+                h.update(f.read())
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, directory: str):
+        self.directory: str = directory
+        self.version: str = generator_version()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, grammar: str, options: Options) -> str:
+        h = hashlib.sha256()
+        h.update(self.version.encode())
+        h.update(json.dumps(dataclasses.asdict(options), sort_keys=True).encode())
+        h.update(pgo.digest(options.profile_data).encode())
+        h.update(grammar.encode())
+        return h.hexdigest()
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def read(self, key: str, suffix: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key, suffix), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key: str, suffix: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path(key, suffix))
+
+    def get_source(self, key: str) -> Optional[str]:
+        data: Optional[bytes] = self.read(key, ".py")
+        return data.decode() if data is not None else None
+
+    def get_log(self, key: str) -> str:
+        data: Optional[bytes] = self.read(key, ".log")
+        return data.decode() if data is not None else ""
+
+    def get_code(self, key: str) -> Optional[CodeType]:
+        data: Optional[bytes] = self.read(key, ".marshal")
+        if data is None:
+            return None
+        try:
+            return marshal.loads(data)
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def put(self, key: str, source: str, log: str = "") -> CodeType:
+        code: CodeType = compile(source, f"<rdgen_{key[:16]}>", "exec")
+        # the source is written last: its presence marks a complete entry
+        self.write(key, ".marshal", marshal.dumps(code))
+        self.write(key, ".log", log.encode())
+        self.write(key, ".py", source.encode())
+        return code
@@ -1,7 +1,22 @@
 import heapq
-from typing import List, Callable, Tuple
+from typing import Iterator, List, Callable, Tuple
 
-from .grammar import Alts, Rep, Opt, Sym, Production, Cons, Expr
+from .grammar import (
+    Alts,
+    Rep,
+    Opt,
+    Sym,
+    Production,
+    Cons,
+    Expr,
+    Sequence,
+    Parens,
+    Lambda,
+    Value,
+    Exit,
+    OnePlus,
+    Infinite,
+)
 
 from .analysis import State
 
@@ -44,6 +59,12 @@ def flatten(exprs: List[Expr | str], state: State) -> List[str | Expr]:
     for e in exprs:
         if isinstance(e, Cons):
             out += flatten([e.car, e.cdr], state)
+        elif isinstance(e, Sequence):
+            out += flatten([e.seq], state)
+        elif isinstance(e, Parens):
+            out += flatten([e.e], state)
+        elif isinstance(e, (Lambda, Value, Exit)):
+            pass
         elif isinstance(e, Sym) and e.value in state.terms:
             v: str
             if e.value[0] == '"':
@@ -100,6 +121,21 @@ def rep(
         heap.push(lis)
 
 
+# oneplus
+def oneplus(
+    self: OnePlus,
+    before: List[Expr | str],
+    after: List[Expr | str],
+    heap: MyHeap,
+    productions: list[Production],
+    state: State,
+):
+    for count in range(1, 4):
+        lis = before + [self.val] * count + after
+        lis = flatten(lis, state)
+        heap.push(lis)
+
+
 # opt
 def opt(
     self: Opt,
@@ -155,8 +191,10 @@ def add_derivations(
         return alts(e, before, after, heap, productions, state)
     elif isinstance(e, Cons):
         return cons(e, before, after, heap, productions, state)
-    elif isinstance(e, Rep):
+    elif isinstance(e, (Rep, Infinite)):
         return rep(e, before, after, heap, productions, state)
+    elif isinstance(e, OnePlus):
+        return oneplus(e, before, after, heap, productions, state)
     elif isinstance(e, Opt):
         return opt(e, before, after, heap, productions, state)
     elif isinstance(e, Sym):
@@ -170,10 +208,18 @@ def min_terminals0(e: Expr | str, state: State) -> int:
         return min([min_terminals0(v, state) for v in e.vals])
     elif isinstance(e, Cons):
         return min_terminals0(e.car, state) + min_terminals0(e.cdr, state)
-    elif isinstance(e, Rep):
+    elif isinstance(e, (Rep, Infinite)):
         return 0
+    elif isinstance(e, OnePlus):
+        return min_terminals0(e.val, state)
     elif isinstance(e, Opt):
         return 0
+    elif isinstance(e, Sequence):
+        return min_terminals0(e.seq, state)
+    elif isinstance(e, Parens):
+        return min_terminals0(e.e, state)
+    elif isinstance(e, (Lambda, Value, Exit)):
+        return 0
     elif isinstance(e, Sym):
         if e.value in state.terms:
             return 1
@@ -197,25 +243,26 @@ def count_terminals(lis: List[Expr | str]) -> int:
 
 def gen_examples(
     grammar: list[Production], state: State, quantity: int, limit: int
-) -> list[str]:
+) -> Iterator[str]:
     def min_terminals(lis: List[Expr | str]) -> int:
         assert isinstance(lis, list)
         return sum([min_terminals0(e, state) for e in lis])
 
-    outputs: List[str] = []
+    outputs: int = 0
     heap = MyHeap(key=lambda x: (min_terminals(x), len(x)), limit=limit)
     start = flatten([grammar[0].rhs], state)
     heap.push(start)
-    while len(heap) > 0 and len(outputs) < quantity:
-        # if len(outputs) % 1000 == 0:
-        #     print(f"# len(outputs)={len(outputs)}")
+    while len(heap) > 0 and outputs < quantity:
+        # if outputs % 1000 == 0:
+        #     print(f"# outputs={outputs}")
         #     print(f"# len(heap)={len(heap._data)}")
         e: List[str | Expr] = heap.pop()
         if count_terminals(e) == len(e):
             assert all(isinstance(s, str) for s in e)
             ss: List[str] = [s for s in e if isinstance(s, str)]
             s: str = " ".join(ss)
-            outputs.append(s)
+            outputs += 1
+            yield s
             # print(f"output: {s.__repr__()}")
         else:
             for i, v in enumerate(e):
@@ -224,4 +271,3 @@ def gen_examples(
                     after = e[i + 1 :]
                     add_derivations(v, before, after, heap, grammar, state)
                     break  # only do leftmost derivation
-    return outputs
@@ -0,0 +1,115 @@
+import concurrent.futures
+import importlib
+import os
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from types import ModuleType
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .create import Options
+from .load import load_module
+from .scanner import Token
+
+# a generated parser is named either by an importable module or by its
+# grammar and the options to generate it with
+Source = str | Tuple[str, Options]
+
+
+@dataclass
+class Result:
+    index: int
+    value: Any = None
+    error: Optional[str] = None
+
+
+def tokens_from_kinds(sentence: str) -> List[Token]:
+    # sentences from "main.py examples" are token kinds separated by spaces
+    tokens: List[Token] = [
+        Token(kind, kind, 1, i) for i, kind in enumerate(sentence.split())
+    ]
+    tokens.append(Token("EOF", "", 1, len(tokens)))
+    return tokens
+
+
+class Worker:
+    def __init__(
+        self, source: Source, tokenize: Optional[Callable[[Any], Iterable[Any]]]
+    ):
+        self.module: ModuleType = (
+            importlib.import_module(source)
+            if isinstance(source, str)
+            else load_module(*source)
+        )
+        self.tokenize: Optional[Callable[[Any], Iterable[Any]]] = tokenize
+        self.parser: Any = None
+
+    def parse(self, index: int, input: Any) -> Result:
+        # one warm Parser is reset for every input, if it can be
+        try:
+            tokens = self.tokenize(input) if self.tokenize else input
+            if self.parser is None or not hasattr(self.parser, "reset"):
+                self.parser = self.module.Parser(tokens)
+            else:
+                self.parser.reset(tokens)
+            return Result(index, self.parser.parse())
+        except Exception as e:
+            return Result(index, error=f"{type(e).__name__}: {e}")
+
+    def parse_chunk(self, chunk: List[Tuple[int, Any]]) -> List[Result]:
+        return [self.parse(index, input) for index, input in chunk]
+
+
+worker: Optional[Worker] = None
+
+
+def start_worker(
+    source: Source, tokenize: Optional[Callable[[Any], Iterable[Any]]]
+) -> None:
+    global worker
+    worker = Worker(source, tokenize)
+
+
+def parse_chunk(chunk: List[Tuple[int, Any]]) -> List[Result]:
+    assert worker
+    return worker.parse_chunk(chunk)
+
+
+def chunks(inputs: Iterable[Any], chunksize: int) -> Iterator[List[Tuple[int, Any]]]:
+    numbered = enumerate(inputs)
+    while chunk := list(islice(numbered, chunksize)):
+        yield chunk
+
+
+def parse_many(
+    source: Source,
+    inputs: Iterable[Any],
+    workers: Optional[int] = None,
+    chunksize: int = 64,
+    tokenize: Optional[Callable[[Any], Iterable[Any]]] = None,
+) -> Iterator[Result]:
+    # inputs are token streams, or anything tokenize (a picklable function)
+    # turns into one; results come back in the order of the inputs
+    if workers == 1:
+        local = Worker(source, tokenize)
+        for chunk in chunks(inputs, chunksize):
+            yield from local.parse_chunk(chunk)
+        return
+    n: int = workers or os.cpu_count() or 1
+    # values of the node classes of a generated module are unpickled from
+    # the module of the same name here
+    if not isinstance(source, str):
+        load_module(*source)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=n, initializer=start_worker, initargs=(source, tokenize)
+    ) as executor:
+        # a bounded window of chunks in flight keeps memory flat for long
+        # input streams
+        window: int = 4 * n
+        pending: Deque[concurrent.futures.Future] = deque()
+        for chunk in chunks(inputs, chunksize):
+            pending.append(executor.submit(parse_chunk, chunk))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,682 @@
+import symtable
+import textwrap
+from types import ModuleType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    NoReturn,
+    Set,
+    Tuple,
+)
+
+from . import ir
+from .create import Options, lower
+from .emit_ir_python import kind_name
+from .inline import walk
+
+# statements are closures run(parser, frame) over a list of the locals of
+# the production being parsed; break and continue are returned as signals
+BREAK = 1
+CONTINUE = 2
+RETURN = 3
+
+Run = Callable[[Any, List[Any]], Any]
+
+
+class ParseErrorException(Exception):
+    def __init__(self, msg: str, current: Any, expected: set[str]):
+        self.msg = msg
+        self.current = current
+        self.expected = expected
+
+    def __str__(self) -> str:
+        return f"Parse error {self.msg} at {self.current}:  Expected {self.expected}"
+
+
+class TokenWindow:
+    # the scanner, read size tokens ahead into a ring buffer
+    __slots__ = ("tokens", "ring", "head")
+
+    def __init__(self, tokens: Iterator[Any], size: int):
+        self.tokens = tokens
+        self.ring: List[Any] = [next(tokens, None) for _ in range(size)]
+        self.head: int = 0
+
+    def __iter__(self) -> "TokenWindow":
+        return self
+
+    def __next__(self) -> Any:
+        token = self.ring[self.head]
+        if token is None:
+            raise StopIteration
+        self.ring[self.head] = next(self.tokens, None)
+        self.head = (self.head + 1) % len(self.ring)
+        return token
+
+    def peek(self, i: int) -> Any:
+        return self.ring[(self.head + i) % len(self.ring)]
+
+
+class ClosureParser:
+    # the interface of a generated Parser; build() adds a method per
+    # production
+    _start: Callable[[Any], Any]
+    # the tokens read ahead of the current one
+    _window: int = 0
+
+    def __init__(self, scanner: Iterable[Any]):
+        self.reset(scanner)
+
+    def reset(self, scanner: Iterable[Any]) -> None:
+        self.scanner: Iterator[Any] = iter(scanner)
+        if self._window:
+            self.scanner = TokenWindow(self.scanner, self._window)
+        self._current = next(self.scanner)
+
+    def error(self, msg: str, expected: set[str]) -> NoReturn:
+        raise ParseErrorException(msg, self._current, expected)
+
+    def match(self, kind: str) -> Any:
+        if self._current.kind == kind:
+            prev = self._current
+            try:
+                self._current = next(self.scanner)
+            except StopIteration:
+                pass
+            return prev
+        else:
+            self.error("", {kind})
+
+    def current(self) -> str:
+        return self._current.kind
+
+    def _lookahead(self, n: int) -> Tuple[str, ...]:
+        kinds: List[str] = [self._current.kind]
+        for i in range(n - 1):
+            token = self.scanner.peek(i)  # type: ignore
+            kinds.append("EOF" if token is None else token.kind)
+        return tuple(kinds)
+
+    def parse(self) -> Any:
+        v = self._start()
+        self.match("EOF")
+        return v
+
+
+def guard_set(guard: ir.Guard) -> FrozenSet[str]:
+    return frozenset(kind_name(t) for t in guard.predict)
+
+
+def lookahead_strings(guard: ir.Guard) -> FrozenSet[Tuple[str, ...]]:
+    return frozenset(tuple(kind_name(t) for t in s) for s in guard.lookahead or ())
+
+
+def test(guard: ir.Guard | None) -> Callable[[Any], bool] | None:
+    # a guard that may look past the current token, as a predicate
+    if guard is None:
+        return None
+    kinds: FrozenSet[str] = guard_set(guard)
+    strings: FrozenSet[Tuple[str, ...]] = lookahead_strings(guard)
+    if not strings:
+        return lambda p: p._current.kind in kinds
+    shared: FrozenSet[str] = frozenset(s[0] for s in strings)
+    n: int = len(next(iter(strings)))
+
+    def lookahead(p: Any) -> bool:
+        if p._current.kind in shared:
+            return p._lookahead(n) in strings
+        return p._current.kind in kinds
+
+    return lookahead
+
+
+def noop(p: Any, f: List[Any]) -> None:
+    return None
+
+
+def sequence(runs: List[Run]) -> Run:
+    if len(runs) == 2:
+        a, b = runs
+
+        def two(p: Any, f: List[Any]) -> None:
+            a(p, f)
+            b(p, f)
+
+        return two
+    if len(runs) == 3:
+        a, b, c = runs
+
+        def three(p: Any, f: List[Any]) -> None:
+            a(p, f)
+            b(p, f)
+            c(p, f)
+
+        return three
+    all = tuple(runs)
+
+    def many(p: Any, f: List[Any]) -> None:
+        for run in all:
+            run(p, f)
+
+    return many
+
+
+def flatten(stmts: List[ir.Stmt]) -> List[ir.Stmt]:
+    # blocks only scope the declarations of the generated code
+    result: List[ir.Stmt] = []
+    for s in stmts:
+        match s:
+            case ir.Sequence(_, body):
+                result += flatten(body)
+            case ir.Empty() | ir.Warning() | ir.Comment() | ir.Verbose():
+                pass
+            case _:
+                result.append(s)
+    return result
+
+
+def signals(stmts: List[ir.Stmt]) -> bool:
+    # whether running stmts can break, continue, or return
+    for s in stmts:
+        match s:
+            case ir.Break() | ir.Continue() | ir.Return():
+                return True
+            case ir.Sequence(_, body):
+                if signals(body):
+                    return True
+            case ir.Loop(_, body, _):
+                # only a return leaves a loop
+                if any(isinstance(t, ir.Return) for t in walk(body)):
+                    return True
+            case ir.SelectAlternative(guardeds, _):
+                if any(signals(g.body) for g in guardeds):
+                    return True
+    return False
+
+
+def variables(stmts: List[ir.Stmt]) -> Set[str]:
+    # the locals that statements other than the grammar's code assign
+    result: Set[str] = set()
+    for s in walk(stmts):
+        match s:
+            case ir.Sequence(decls, _):
+                result.update(d.name for d in decls)
+            case ir.Terminal(lhs, _) | ir.NonTerminal(lhs, _) | ir.Climb(lhs, _, _):
+                if lhs:
+                    result.add(lhs)
+            case ir.Copy(lhs, _) | ir.AssignNull(lhs) | ir.AssignEmptyList(lhs):
+                result.add(lhs)
+            case ir.AppendToList(lhs, value):
+                result.update((lhs, value))
+            case ir.Return(value):
+                if value:
+                    result.add(value)
+    return result
+
+
+def identifiers(table: symtable.SymbolTable) -> Set[str]:
+    result: Set[str] = set(table.get_identifiers())
+    for child in table.get_children():
+        result |= identifiers(child)
+    return result
+
+
+class Compiler:
+    def __init__(self, program: ir.Program, namespace: Dict[str, Any]):
+        self.program: ir.Program = program
+        self.namespace: Dict[str, Any] = namespace
+        # one cell per production, filled once every production is compiled,
+        # so that calls need not be resolved in order
+        self.cells: Dict[str, List[Any]] = {
+            f.name: [None] for f in program.functions
+        }
+        for l in program.ladders:
+            self.cells[f"{l.name}__climb"] = [None]
+        self.function_name: str = ""
+        self.slots: Dict[str, int] = {}
+        # the frame slot of every local of every production
+        self.layouts: Dict[str, Dict[str, int]] = {}
+        self.snippets: Dict[Tuple[str, int], Run] = {}
+        self.compile_snippets()
+
+    def slot(self, name: str) -> int:
+        return self.slots[name]
+
+    def compile_snippets(self) -> None:
+        # the grammar's code runs as functions that copy the locals they
+        # use in from the frame and those they assign back out.  Which
+        # those are is found (by symtable) and all the functions are
+        # compiled at once, which is much cheaper than analyzing and
+        # compiling every piece by itself.
+        found: List[Tuple[ir.Function, ir.Stmt, List[str]]] = []
+        own: Dict[str, Set[str]] = {}
+        for f in self.program.functions:
+            own[f.name] = variables(f.body)
+            for s in walk(f.body):
+                match s:
+                    case ir.Copy(_, rhs) if rhs.strip() not in own[f.name]:
+                        body: str = textwrap.indent(
+                            textwrap.dedent(rhs).strip("\n"), "        "
+                        )
+                        found.append((f, s, [body, "    )"]))
+                    case ir.Corn(value):
+                        body = textwrap.indent(
+                            textwrap.dedent(value).strip("\n"), "    "
+                        )
+                        found.append((f, s, [body]))
+        bare: List[str] = []
+        for i, (f, s, body) in enumerate(found):
+            bare.append(f"def _snippet_{i}(self, _frame_):")
+            bare += (["    return ("] if isinstance(s, ir.Copy) else []) + body
+        tables: List[symtable.SymbolTable] = symtable.symtable(
+            "\n".join(bare), "<grammar>", "exec"
+        ).get_children()
+        assigned: Dict[str, Set[str]] = {f.name: set() for f in self.program.functions}
+        for (f, _, _), table in zip(found, tables):
+            assigned[f.name].update(table.get_locals())
+        for f in self.program.functions:
+            locals: Set[str] = own[f.name] | assigned[f.name]
+            locals -= {"self", "_frame_"} | set(f.params)
+            self.layouts[f.name] = {
+                n: i for i, n in enumerate(list(f.params) + sorted(locals))
+            }
+        lines: List[str] = []
+        for i, ((f, s, body), table) in enumerate(zip(found, tables)):
+            slots: Dict[str, int] = self.layouts[f.name]
+            used: List[str] = sorted(n for n in identifiers(table) if n in slots)
+            lines.append(f"def _snippet_{i}(self, _frame_):  # {f.name}")
+            lines += [f"    {n} = _frame_[{slots[n]}]" for n in used]
+            if isinstance(s, ir.Copy):
+                # the value is stored in the frame, not returned
+                lines += [f"    _frame_[{slots[s.lhs]}] = ("] + body
+            else:
+                stored: Set[str] = set(table.get_locals())
+                lines += body
+                lines += [f"    _frame_[{slots[n]}] = {n}" for n in used if n in stored]
+        namespace: Dict[str, Any] = {}
+        exec(compile("\n".join(lines), "<grammar>", "exec"), self.namespace, namespace)
+        for i, (f, s, _) in enumerate(found):
+            self.snippets[f.name, id(s)] = namespace[f"_snippet_{i}"]
+
+    def stmts(self, stmts: List[ir.Stmt]) -> Run:
+        stmts = flatten(stmts)
+        runs: List[Run] = [self.stmt(s) for s in stmts]
+        runs = [r for r in runs if r is not noop]
+        if not runs:
+            return noop
+        if len(runs) == 1:
+            return runs[0]
+        if not signals(stmts):
+            return sequence(runs)
+        checked = tuple(runs)
+
+        def checked_sequence(p: Any, f: List[Any]) -> Any:
+            for run in checked:
+                r = run(p, f)
+                if r:
+                    return r
+            return None
+
+        return checked_sequence
+
+    def stmt(self, s: ir.Stmt) -> Run:
+        match s:
+            case ir.Sequence(_, stmts):
+                return self.stmts(stmts)
+            case ir.Copy(lhs, rhs):
+                i: int = self.slot(lhs)
+                if (self.function_name, id(s)) not in self.snippets:
+                    j: int = self.slot(rhs.strip())
+
+                    def copy(p: Any, f: List[Any]) -> None:
+                        f[i] = f[j]
+
+                    return copy
+                return self.snippets[self.function_name, id(s)]
+            case ir.Terminal(lhs, term):
+                return self.terminal(lhs, kind_name(term))
+            case ir.NonTerminal(lhs, nonterm):
+                return self.call(lhs, self.cells[nonterm], ())
+            case ir.Climb(lhs, ladder, level):
+                return self.call(lhs, self.cells[f"{ladder}__climb"], (level,))
+            case ir.Loop(top, body, bottom) if (top and top.lookahead) or (
+                bottom and bottom.lookahead
+            ):
+                return self.lookahead_loop(test(top), self.stmts(body), test(bottom))
+            case ir.Loop(top, body, bottom):
+                return self.loop(
+                    top and guard_set(top),
+                    self.stmts(body),
+                    bottom and guard_set(bottom),
+                    signals(body),
+                )
+            case ir.SelectAlternative(guardeds, error):
+                return self.select(guardeds, error)
+            case ir.Corn():
+                return self.snippets[self.function_name, id(s)]
+            case ir.Break():
+                return lambda p, f: BREAK
+            case ir.Continue():
+                return lambda p, f: CONTINUE
+            case ir.AssignNull(lhs):
+                i = self.slot(lhs)
+
+                def null(p: Any, f: List[Any]) -> None:
+                    f[i] = None
+
+                return null
+            case ir.AssignEmptyList(lhs):
+                i = self.slot(lhs)
+
+                def empty_list(p: Any, f: List[Any]) -> None:
+                    f[i] = []
+
+                return empty_list
+            case ir.AppendToList(lhs, value):
+                i, j = self.slot(lhs), self.slot(value)
+
+                def append(p: Any, f: List[Any]) -> None:
+                    f[i].append(f[j])
+
+                return append
+            case ir.Return(value):
+                i = self.slot(value) if value else -1
+
+                def return_(p: Any, f: List[Any]) -> int:
+                    f[-1] = f[i] if i >= 0 else None
+                    return RETURN
+
+                return return_
+            case ir.Empty() | ir.Warning() | ir.Comment() | ir.Verbose():
+                return noop
+        raise Exception(f"unhandled statement {s}")
+
+    def terminal(self, lhs: str | None, k: str) -> Run:
+        expected: set[str] = {k}
+        if lhs is None:
+
+            def skip(p: Any, f: List[Any]) -> None:
+                if p._current.kind != k:
+                    p.error("", expected)
+                try:
+                    p._current = next(p.scanner)
+                except StopIteration:
+                    pass
+
+            return skip
+        i: int = self.slot(lhs)
+
+        def match(p: Any, f: List[Any]) -> None:
+            t = p._current
+            if t.kind != k:
+                p.error("", expected)
+            try:
+                p._current = next(p.scanner)
+            except StopIteration:
+                pass
+            f[i] = t
+
+        return match
+
+    def call(self, lhs: str | None, cell: List[Any], args: tuple) -> Run:
+        if lhs is None:
+
+            def call(p: Any, f: List[Any]) -> None:
+                cell[0](p, *args)
+
+            return call
+        i: int = self.slot(lhs)
+        if not args:
+
+            def call_value(p: Any, f: List[Any]) -> None:
+                f[i] = cell[0](p)
+
+            return call_value
+
+        def call_args(p: Any, f: List[Any]) -> None:
+            f[i] = cell[0](p, *args)
+
+        return call_args
+
+    def loop(
+        self,
+        top: FrozenSet[str] | None,
+        body: Run,
+        bottom: FrozenSet[str] | None,
+        signaled: bool,
+    ) -> Run:
+        if not signaled and top is not None and bottom is None:
+
+            def rep(p: Any, f: List[Any]) -> None:
+                while p._current.kind in top:
+                    body(p, f)
+
+            return rep
+        if not signaled and top is None and bottom is not None:
+
+            def oneplus(p: Any, f: List[Any]) -> None:
+                while True:
+                    body(p, f)
+                    if p._current.kind not in bottom:
+                        break
+
+            return oneplus
+
+        # a continue skips the bottom test, as in the generated while loop
+        def loop(p: Any, f: List[Any]) -> Any:
+            while top is None or p._current.kind in top:
+                r = body(p, f)
+                if r == BREAK:
+                    break
+                if r == RETURN:
+                    return r
+                if r == CONTINUE:
+                    continue
+                if bottom is not None and p._current.kind not in bottom:
+                    break
+            return None
+
+        return loop
+
+    def lookahead_loop(
+        self,
+        top: Callable[[Any], bool] | None,
+        body: Run,
+        bottom: Callable[[Any], bool] | None,
+    ) -> Run:
+        def loop(p: Any, f: List[Any]) -> Any:
+            while top is None or top(p):
+                r = body(p, f)
+                if r == BREAK:
+                    break
+                if r == RETURN:
+                    return r
+                if r == CONTINUE:
+                    continue
+                if bottom is not None and not bottom(p):
+                    break
+            return None
+
+        return loop
+
+    def select(self, guardeds: List[ir.Guarded], error: ir.ParseError | None) -> Run:
+        # the first alternative that predicts a token wins, as in if/elif;
+        # a token that alternatives share picks one by the tokens after it
+        table: Dict[str, Run] = {}
+        shared: Dict[str, List[Tuple[int, FrozenSet[Tuple[str, ...]], Run]]] = {}
+        for g in guardeds:
+            run: Run = self.stmts(g.body)
+            strings: FrozenSet[Tuple[str, ...]] = lookahead_strings(g.guard)
+            for s in strings:
+                shared.setdefault(s[0], [])
+            for k in guard_set(g.guard):
+                if k in shared and strings:
+                    shared[k].append((len(next(iter(strings))), strings, run))
+                elif k in shared:
+                    # as in elif, without looking further
+                    shared[k].append((1, frozenset({(k,)}), run))
+                else:
+                    table.setdefault(k, run)
+        if shared:
+            expected: set[str] = set(table) | set(shared)
+            message: str = error.message if error else ""
+
+            def fail(p: Any, f: List[Any]) -> None:
+                if error is not None:
+                    p.error(message, expected)
+
+            for k, choices in shared.items():
+                table.setdefault(k, self.resolver(choices, fail))
+        if error is None:
+            get = table.get
+
+            def option(p: Any, f: List[Any]) -> Any:
+                run = get(p._current.kind)
+                if run is not None:
+                    return run(p, f)
+                return None
+
+            return option
+        message = error.message
+        expected = set(table)
+
+        def alternatives(p: Any, f: List[Any]) -> Any:
+            run = table.get(p._current.kind)
+            if run is None:
+                p.error(message, expected)
+            return run(p, f)
+
+        return alternatives
+
+    def resolver(
+        self, choices: List[Tuple[int, FrozenSet[Tuple[str, ...]], Run]], fail: Run
+    ) -> Run:
+        def resolve(p: Any, f: List[Any]) -> Any:
+            for n, strings, run in choices:
+                if p._lookahead(n) in strings:
+                    return run(p, f)
+            return fail(p, f)
+
+        return resolve
+
+    def function(self, f: ir.Function) -> Callable[..., Any]:
+        self.function_name = f.name
+        self.slots = self.layouts[f.name]
+        body: List[ir.Stmt] = f.body
+        # the last slot holds the value of a return before the end
+        size: int = len(self.slots) + 1
+        result: int = size - 1
+        if body and isinstance(body[-1], ir.Return):
+            value: str | None = body[-1].value
+            body = body[:-1]
+            if value:
+                result = self.slot(value)
+        run: Run = self.stmts(body)
+        nparams: int = len(f.params)
+
+        if nparams:
+
+            def production_args(p: Any, *args: Any) -> Any:
+                frame: List[Any] = [None] * size
+                frame[:nparams] = args
+                run(p, frame)
+                return frame[result]
+
+            return production_args
+        if size == 1:
+            # without locals, nothing is stored in the frame but None
+            shared: List[Any] = [None]
+
+            def production_without_locals(p: Any) -> Any:
+                run(p, shared)
+
+            return production_without_locals
+
+        def production(p: Any) -> Any:
+            frame: List[Any] = [None] * size
+            run(p, frame)
+            return frame[result]
+
+        return production
+
+    def ladder(self, l: ir.Ladder) -> Callable[..., Any]:
+        # precedence climbing, as in the generated ladder methods
+        ops: Dict[str, int] = {
+            kind_name(op): level for level, r in enumerate(l.rungs) for op in r.ops
+        }
+        opaque: List[int] = []
+        for level, r in enumerate(l.rungs):
+            opaque.append(level if r.opaque else opaque[-1] if opaque else -1)
+        primary: List[Any] = self.cells[l.primary]
+        rests: List[List[Any]] = [self.cells[r.rest] for r in l.rungs]
+        last: int = len(l.rungs) - 1
+
+        def climb(p: Any, level: int) -> Any:
+            v = primary[0](p)
+            k = last
+            while k >= level:
+                j = ops.get(p._current.kind, -1)
+                if j > k:
+                    j = -1
+                if j < opaque[k]:
+                    j = opaque[k]
+                if j < level:
+                    break
+                v = rests[j][0](p, v)
+                k = j - 1
+            return v
+
+        return climb
+
+    def compile(self) -> type:
+        methods: Dict[str, Any] = {}
+        for f in self.program.functions:
+            self.cells[f.name][0] = methods[f"_{f.name}"] = self.function(f)
+        for l in self.program.ladders:
+            name: str = f"{l.name}__climb"
+            self.cells[name][0] = methods[f"_{name}"] = self.ladder(l)
+        methods["_start"] = self.cells[self.program.start_nonterminal][0]
+        methods["_window"] = self.program.lookahead - 1
+        return type("Parser", (ClosureParser,), methods)
+
+
+UNSUPPORTED = (
+    "stack",
+    "lazy",
+    "profile",
+    "recover",
+    "validate",
+    "push",
+    "columnar",
+    "cst",
+    "events",
+    "incremental",
+)
+
+
+def build(program: ir.Program, name: str = "rdgen_closures") -> ModuleType:
+    # a module like a generated one, without its source: the grammar's own
+    # code runs in it, and Parser is made of closures
+    module = ModuleType(name)
+    for p in program.prologue:
+        exec(compile(p, f"<{name}>", "exec"), module.__dict__)
+    module.ParseErrorException = ParseErrorException
+    module.Parser = Compiler(program, module.__dict__).compile()
+    return module
+
+
+def load_module(grammar: str, options: Options = Options()) -> ModuleType:
+    for name in UNSUPPORTED:
+        if getattr(options, name):
+            raise ValueError(f"closures cannot be combined with --{name}")
+    _, program = lower(grammar, options)
+    return build(program)
+
+
+def load_parser(grammar: str, options: Options = Options()) -> type:
+    return load_module(grammar, options).Parser
@@ -1,33 +1,179 @@
+import contextlib
+import io
 import sys
-from typing import Any, Dict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, TextIO, Tuple
 
 from . import infer
+from .grammar import Spec
 from .read import process_grammar
 from . import gen_ir
+from . import ir
+from . import inline
+from . import liveness
+from . import pgo
 
 
-def create(infile: str, outfile: str, verbose: bool, decorate: bool) -> None:
-    if infile:
-        with open(infile, "r") as f:
-            input = f.read()
-    else:
-        input = sys.stdin.read()
+@dataclass(frozen=True)
+class Options:
+    verbose: bool = False
+    decorate: bool = False
+    inline_size: int = 0
+    stack: bool = False
+    climb: bool = False
+    rewrite: bool = False
+    lazy: bool = False
+    profile: bool = False
+    profile_data: str = ""
+    recover: bool = False
+    validate: bool = False
+    push: bool = False
+    columnar: bool = False
+    ast: bool = False
+    cst: bool = False
+    events: bool = False
+    incremental: bool = False
+    keep_dead: bool = False
+
+
+def check(options: Options) -> None:
+    if options.validate and options.stack:
+        raise ValueError("--validate cannot be combined with --stack")
+    if options.inline_size:
+        for name in ("recover", "cst", "events", "incremental"):
+            if getattr(options, name):
+                raise ValueError(f"--{name} cannot be combined with --inline")
+    if options.push:
+        for name in ("stack", "profile", "recover", "validate"):
+            if getattr(options, name):
+                raise ValueError(f"--push cannot be combined with --{name}")
+    if options.columnar:
+        for name in ("push", "profile", "recover", "validate"):
+            if getattr(options, name):
+                raise ValueError(f"--columnar cannot be combined with --{name}")
+    if options.cst:
+        for name in ("push", "climb", "recover"):
+            if getattr(options, name):
+                raise ValueError(f"--cst cannot be combined with --{name}")
+    if options.events:
+        for name in ("push", "climb", "recover", "columnar"):
+            if getattr(options, name):
+                raise ValueError(f"--events cannot be combined with --{name}")
+    if options.incremental:
+        for name in (
+            "push",
+            "climb",
+            "recover",
+            "validate",
+            "profile",
+            "columnar",
+            "cst",
+            "events",
+        ):
+            if getattr(options, name):
+                raise ValueError(f"--incremental cannot be combined with --{name}")
+
+
+def lower(input: str, options: Options) -> Tuple[Spec, ir.Program]:
+    # the grammar as the IR program that the backends translate
+    check(options)
     pragmas: Dict[str, Any]
-    spec, state, pragmas = process_grammar(input)
+    spec, state, pragmas = process_grammar(input, options.rewrite, options.ast)
+    decorate: bool = options.decorate or options.ast
     if decorate:
-        inferer = infer.Inference(spec.productions, verbose)
+        inferer = infer.Inference(spec.productions, options.verbose)
         inferer.do_inference()
+    ir_emitter = gen_ir.Emitter(
+        spec, state, pragmas, options.verbose, decorate, options.climb
+    )
+    generated = ir_emitter.emit_parser(state)
+    if options.push and generated.lookahead > 1:
+        raise ValueError("--push cannot look ahead more than one token")
+    if options.profile_data:
+        generated = pgo.reorder(generated, pgo.load(options.profile_data))
+    # values that nothing reads are left out, unless they are wanted (e.g.,
+    # for debugging)
+    eliminate: bool = decorate and not options.keep_dead
+    if eliminate:
+        generated = liveness.eliminate(generated)
+    if options.inline_size > 0:
+        generated = inline.inline(generated, options.inline_size)
+        if eliminate:
+            generated = liveness.eliminate(generated)
+    return spec, generated
+
+
+def generate(input: str, file: TextIO, options: Options) -> Spec:
     from . import emit_ir_python
 
-    ir_emitter = gen_ir.Emitter(spec, state, pragmas, verbose, decorate)
-    generated = ir_emitter.emit_parser(state)
+    spec, generated = lower(input, options)
+    py_emitter = emit_ir_python.Emitter(
+        generated,
+        file,
+        options.verbose,
+        options.stack,
+        options.lazy,
+        options.profile,
+        options.recover,
+        options.validate,
+        options.push,
+        options.columnar,
+        options.cst,
+        options.events,
+        options.incremental,
+    )
+    py_emitter.emit_program()
+    return spec
+
+
+def create(
+    infile: str,
+    outfile: str,
+    verbose: bool = False,
+    decorate: bool = False,
+    options: Optional[Options] = None,
+    cache_dir: str = "",
+) -> None:
+    # verbose and decorate are only used when no options are given
+    if options is None:
+        options = Options(verbose=verbose, decorate=decorate)
+    if infile:
+        with open(infile, "r") as f:
+            input = f.read()
+    else:
+        input = sys.stdin.read()
+    if cache_dir:
+        source, log = cached(input, options, cache_dir)
+        if outfile:
+            with open(outfile, "w") as f:
+                f.write(source)
+        else:
+            sys.stdout.write(source)
+        sys.stdout.write(log)
+        return
     if outfile:
         with open(outfile, "w") as f:
-            py_emitter = emit_ir_python.Emitter(generated, f, verbose)
-            py_emitter.emit_program()
+            spec = generate(input, f, options)
     else:
-        py_emitter = emit_ir_python.Emitter(generated, sys.stdout, verbose)
-        py_emitter.emit_program()
+        spec = generate(input, sys.stdout, options)
 
-    if verbose:
+    if options.verbose:
         spec.dump("# ")
+
+
+def cached(input: str, options: Options, cache_dir: str) -> Tuple[str, str]:
+    from .artifacts import ArtifactCache
+
+    artifacts = ArtifactCache(cache_dir)
+    key: str = artifacts.key(input, options)
+    source: Optional[str] = artifacts.get_source(key)
+    if source is not None:
+        return source, artifacts.get_log(key)
+    out = io.StringIO()
+    spec: Spec = generate(input, out, options)
+    log = io.StringIO()
+    if options.verbose:
+        with contextlib.redirect_stdout(log):
+            spec.dump("# ")
+    artifacts.put(key, out.getvalue(), log.getvalue())
+    return out.getvalue(), log.getvalue()
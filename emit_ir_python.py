@@ -1,20 +1,46 @@
 from .ir import *
-from typing import TextIO
+from .pgo import guard_key
+from .inline import walk
+from typing import TextIO, Set, Tuple
 from collections import defaultdict
+import io
+import textwrap
+
+
+def kind_name(s: str) -> str:
+    # the kind of the tokens a terminal matches
+    return s[1:-1] if s[:1] == '"' and s[-1:] == '"' and len(s) > 1 else s
 
 
 def term_repr(s: str) -> str:
-    return s.replace('"', "").__repr__()
+    return kind_name(s).__repr__()
 
 
 def set_repr(s: set[str]) -> str:
     return "{" + ", ".join(term_repr(w) for w in sorted(s)) + "}"
 
 
-def mk_guard(guard: Optional[Guard]) -> str:
+def strings_repr(strings: Set[Tuple[str, ...]]) -> str:
+    return "{" + ", ".join(
+        "(" + ", ".join(term_repr(t) for t in s) + ")" for s in sorted(strings)
+    ) + "}"
+
+
+def mk_guard(guard: Optional[Guard], current: str = "current()") -> str:
     if not guard:
         return "True"
-    return f"self.current() in {set_repr(guard.predict)}"
+    if not guard.lookahead:
+        return f"self.{current} in {set_repr(guard.predict)}"
+    # only a token the decision's choices share needs the tokens after it
+    shared: Set[str] = set(s[0] for s in guard.lookahead)
+    n: int = len(next(iter(guard.lookahead)))
+    deep: str = (
+        f"self.{current} in {set_repr(shared)}"
+        f" and self._lookahead({n}) in {strings_repr(guard.lookahead)}"
+    )
+    if guard.predict <= shared:
+        return deep
+    return f"self.{current} in {set_repr(guard.predict - shared)} or {deep}"
 
 
 class Emitter:
@@ -25,19 +51,178 @@ class Emitter:
     indent: str
     types: Dict[str, Dict[str, str]]
     current: Dict[str, str]
+    function_name: str
+    recursive_calls: Dict[str, Set[str]]
 
     def __init__(
         self,
         program: Program,
         file: TextIO,
         verbose: bool,
+        stack: bool = False,
+        lazy: bool = False,
+        profile: bool = False,
+        recover: bool = False,
+        validate: bool = False,
+        push: bool = False,
+        columnar: bool = False,
+        cst: bool = False,
+        events: bool = False,
+        incremental: bool = False,
     ) -> None:
         self.program: Program = program
         self.file: TextIO = file
         self.verbose: bool = verbose
+        self.stack: bool = stack
+        self.lazy: bool = lazy
+        self.lazy_sources: Dict[str, str] = {}
+        self.profile: bool = profile
+        self.recover: bool = recover
+        self.validate: bool = validate
+        self.known: Optional[Set[str]] = None
+        self.push: bool = push
+        self.columnar: bool = columnar
+        self.cst: bool = cst
+        self.events: bool = events
+        self.incremental: bool = incremental
+        self.kind_ids: Dict[str, int] = (
+            self.find_kinds() if columnar or cst else {}
+        )
+        # syntax tree nodes are terminals (numbered as by kind_ids) or
+        # productions
+        self.node_ids: Dict[str, int] = {
+            f.name: len(self.kind_ids) + i for i, f in enumerate(program.functions)
+        }
+        self.profile_index: Dict[str, int] = {
+            f.name: i for i, f in enumerate(program.functions)
+        }
+        self.branch_index: Dict[Tuple[str, str], int] = (
+            self.find_branches() if profile else {}
+        )
         self.prefix = "_"
         self.indent = "    "
         self.process_pragmas()
+        self.recursive_calls = {}
+        self.ladder_rungs: Dict[str, List[Rung]] = {
+            l.name: l.rungs for l in program.ladders
+        }
+        self.generators: Set[str] = (
+            self.find_generators() if stack else set()
+        )
+
+    def find_generators(self) -> Set[str]:
+        # in stack mode, only calls between mutually recursive productions
+        # can nest without bound; those are yielded to the driver loop in
+        # _run(), and every other call stays a plain method call
+        def calls(stmts: List[Stmt]) -> Set[str]:
+            result: Set[str] = set()
+            for s in stmts:
+                match s:
+                    case NonTerminal(_, nonterm):
+                        result.add(nonterm)
+                    case Climb(_, ladder, _):
+                        result.add(f"{ladder}__climb")
+                    case Sequence(_, body) | Loop(_, body, _):
+                        result |= calls(body)
+                    case SelectAlternative(guardeds, _):
+                        for g in guardeds:
+                            result |= calls(g.body)
+            return result
+
+        graph: Dict[str, Set[str]] = {
+            f.name: calls(f.body) for f in self.program.functions
+        }
+        for l in self.program.ladders:
+            graph[f"{l.name}__climb"] = set(
+                [l.primary] + [r.rest for r in l.rungs]
+            )
+        reach: Dict[str, Set[str]] = {}
+        for name in graph:
+            seen: Set[str] = set()
+            work: List[str] = list(graph[name])
+            while work:
+                n = work.pop()
+                if n not in seen and n in graph:
+                    seen.add(n)
+                    work.extend(graph[n])
+            reach[name] = seen
+        self.recursive_calls: Dict[str, Set[str]] = {
+            name: set(n for n in callees if name in reach.get(n, set()))
+            for name, callees in graph.items()
+        }
+        return set(name for name in graph if self.recursive_calls[name])
+
+    def find_branches(self) -> Dict[Tuple[str, str], int]:
+        # one counter per alternative of every labeled SelectAlternative;
+        # inlined copies of a production share the counters of the original
+        result: Dict[Tuple[str, str], int] = {}
+
+        def visit(stmts: List[Stmt]) -> None:
+            for s in stmts:
+                match s:
+                    case Sequence(_, body) | Loop(_, body, _):
+                        visit(body)
+                    case SelectAlternative(guardeds, _):
+                        for g in guardeds:
+                            key = (s.label, guard_key(g.guard))
+                            if s.label and key not in result:
+                                result[key] = len(result)
+                            visit(g.body)
+
+        for f in self.program.functions:
+            visit(f.body)
+        return result
+
+    def find_kinds(self) -> Dict[str, int]:
+        # columnar input and syntax trees number token kinds; EOF is 0
+        kinds: Set[str] = set()
+        for f in self.program.functions:
+            for s in walk(f.body):
+                match s:
+                    case Terminal(_, term):
+                        kinds.add(kind_name(term))
+                    case Loop(top, _, bottom):
+                        for g in (top, bottom):
+                            if g:
+                                kinds.update(kind_name(t) for t in g.predict)
+                    case SelectAlternative(guardeds, _):
+                        for g in guardeds:
+                            kinds.update(kind_name(t) for t in g.guard.predict)
+        kinds.discard("EOF")
+        return {k: i for i, k in enumerate(["EOF"] + sorted(kinds))}
+
+    def guard(self, guard: Optional[Guard]) -> str:
+        if not self.columnar or not guard:
+            return mk_guard(guard)
+
+        def ids(kinds: Set[str]) -> str:
+            return ", ".join(
+                str(i) for i in sorted(self.kind_ids[kind_name(t)] for t in kinds)
+            )
+
+        if not guard.lookahead:
+            return f"self._kind in {{{ids(guard.predict)}}}"
+        shared: Set[str] = set(s[0] for s in guard.lookahead)
+        n: int = len(next(iter(guard.lookahead)))
+        strings: str = ", ".join(
+            "(" + ", ".join(str(self.kind_ids[kind_name(t)]) for t in s) + ")"
+            for s in sorted(guard.lookahead)
+        )
+        deep: str = (
+            f"self._kind in {{{ids(shared)}}} and self._lookahead({n}) in {{{strings}}}"
+        )
+        if guard.predict <= shared:
+            return deep
+        return f"self._kind in {{{ids(guard.predict - shared)}}} or {deep}"
+
+    def call(self, callee: str, c: str) -> str:
+        if self.push:
+            return f"(yield {c})"
+        if callee in self.recursive_calls.get(self.function_name, set()):
+            return f"(yield {c})"
+        if callee in self.generators:
+            return f"self._run({c})"
+        return c
 
     def emit_stmts(self, stmts: List[Stmt], indent: str) -> None:
         if not stmts:
@@ -69,15 +254,30 @@ class Emitter:
                     if d.name in self.current:
                         self.emit(f"{indent}{d.name}: {self.current[d.name]}")
                 self.emit_stmts(stmts, indent)
+            case Terminal(lhs, term) if self.columnar:
+                k: int = self.kind_ids[kind_name(term)]
+                if lhs:
+                    self.emit(f"{indent}{lhs} = self.match({k})  # {term_repr(term)}")
+                else:
+                    self.emit(f"{indent}self.skip({k})  # {term_repr(term)}")
             case Terminal(lhs, term):
                 tgt: str = f"{lhs} = " if lhs else ""
                 self.emit(f"{indent}{tgt}self.match({term_repr(term)})")
+                if self.push:
+                    # wait for the next token to be fed
+                    self.emit(f"{indent}yield")
             case NonTerminal(lhs, nonterm):
                 tgt: str = f"{lhs} = " if lhs else ""
-                self.emit(f"{indent}{tgt}self.{self.prefix}{nonterm}()")
+                c: str = f"self.{self.prefix}{nonterm}()"
+                self.emit(f"{indent}{tgt}{self.call(nonterm, c)}")
+            case Climb(lhs, ladder, level):
+                tgt: str = f"{lhs} = " if lhs else ""
+                name: str = f"{ladder}__climb"
+                c: str = f"self.{self.prefix}{name}({level})"
+                self.emit(f"{indent}{tgt}{self.call(name, c)}")
             case Loop(top, body, bottom):
-                t: str = mk_guard(top)
-                b: str = mk_guard(bottom)
+                t: str = self.guard(top)
+                b: str = self.guard(bottom)
                 self.emit(f"{indent}while {t}:")
                 self.emit_stmts(body, indent1)
                 if bottom:
@@ -86,8 +286,11 @@ class Emitter:
             case SelectAlternative(guardeds, error):
                 test = "if"
                 for g in guardeds:
-                    self.emit(f"{indent}{test} {mk_guard(g.guard)}:")
+                    self.emit(f"{indent}{test} {self.guard(g.guard)}:")
                     test = "elif"
+                    if self.profile and s.label:
+                        k: int = self.branch_index[(s.label, guard_key(g.guard))]
+                        self.emit(f"{indent1}self._profile_branches[{k}] += 1")
                     self.emit_stmts(g.body, indent1)
                 if error:
                     all: set[str] = set(x for g in guardeds for x in g.guard.predict)
@@ -122,20 +325,180 @@ class Emitter:
                 raise Exception(f"unhandled statement {s}")
 
     def function(self, f: Function) -> None:
+        if not self.lazy:
+            self.function_def(f)
+            return
+        # keep the source of the method and compile it on first use
+        file: TextIO = self.file
+        self.file = io.StringIO()
+        self.function_def(f)
+        source: str = textwrap.dedent(self.file.getvalue())
+        self.file = file
+        self.lazy_sources[f"{self.prefix}{f.name}"] = source
+
+    def validator(self, name: str, body: List[Stmt]) -> None:
+        if not self.lazy:
+            self.validator_def(name, body)
+            return
+        file: TextIO = self.file
+        self.file = io.StringIO()
+        self.validator_def(name, body)
+        source: str = textwrap.dedent(self.file.getvalue())
+        self.file = file
+        self.lazy_sources[f"_v_{name}"] = source
+
+    def validator_def(self, name: str, body: List[Stmt]) -> None:
+        # the same control flow as the production's method, but without
+        # values or exceptions: a failure returns False
+        self.emit(f"{self.indent}def _v_{name}(self) -> bool:")
+        self.known = None
+        self.validate_stmts(body, self.indent * 2)
+        self.emit(f"{self.indent * 2}return True")
+        self.emit()
+
+    def validate_stmts(self, stmts: List[Stmt], indent: str) -> None:
+        if not any([self.validate_stmt(s, indent) for s in stmts]):
+            self.emit(f"{indent}pass")
+
+    def validate_stmt(self, s: Stmt, indent: str) -> bool:
+        indent1: str = indent + self.indent
+        indent2: str = indent + self.indent * 2
+        match s:
+            case Sequence(_, stmts):
+                return any([self.validate_stmt(t, indent) for t in stmts])
+            case Terminal(_, term):
+                # a guard may already have checked the token
+                if self.known != {term}:
+                    self.emit(f"{indent}if self._current.kind != {term_repr(term)}:")
+                    self.emit(f"{indent1}return False")
+                self.emit(f"{indent}self._current = next(self.scanner, self._current)")
+            case NonTerminal(_, nonterm):
+                self.emit(f"{indent}if not self._v_{nonterm}():")
+                self.emit(f"{indent1}return False")
+            case Climb(_, ladder, level):
+                nonterm: str = self.ladder_rungs[ladder][level].nonterm
+                self.emit(f"{indent}if not self._v_{nonterm}():")
+                self.emit(f"{indent1}return False")
+            case Loop(top, body, bottom):
+                self.emit(f"{indent}while {mk_guard(top, '_current.kind')}:")
+                self.known = top.predict if top else None
+                self.validate_stmts(body, indent1)
+                if bottom:
+                    self.emit(f"{indent1}if not ({mk_guard(bottom, '_current.kind')}):")
+                    self.emit(f"{indent2}break")
+            case SelectAlternative(guardeds, error):
+                test = "if"
+                for g in guardeds:
+                    self.emit(f"{indent}{test} {mk_guard(g.guard, '_current.kind')}:")
+                    test = "elif"
+                    self.known = g.guard.predict
+                    self.validate_stmts(g.body, indent1)
+                if error:
+                    self.emit(f"{indent}else:")
+                    self.emit(f"{indent1}return False")
+            case Break():
+                self.emit(f"{indent}break")
+            case Continue():
+                self.emit(f"{indent}continue")
+            case _:
+                return False
+        self.known = None
+        return True
+
+    def function_def(self, f: Function) -> None:
         rettype: str = (
             self.types[f.name]["return"] if "return" in self.types[f.name] else ""
         )
         retdecl: str = f"->{rettype}" if rettype else ""
-        self.emit(f"{self.indent}def {self.prefix}{f.name}(self){retdecl}:")
+        params: str = "".join(f", {p}" for p in f.params)
+        self.emit(
+            f"{self.indent}def {self.prefix}{f.name}(self{params}){retdecl}:"
+        )
+        self.function_name = f.name
         self.current = self.types[f.name]
         if rettype:
             tname = f"_{f.name}_"
             # self.emit(f"{self.indent * 2}{tname}: {rettype}")
             if not tname in self.types[f.name]:
                 self.types[f.name][tname] = rettype
-        self.emit_stmts(f.body, self.indent * 2)
+        if self.push and not any(
+            isinstance(s, (Terminal, NonTerminal, Climb)) for s in walk(f.body)
+        ):
+            self.emit(f"{self.indent * 2}yield from ()")
+        if self.profile:
+            self.profiled_body(f)
+        else:
+            self.body(f, self.indent * 2)
         self.emit()
 
+    def body(self, f: Function, indent: str) -> None:
+        if self.incremental:
+            # reuse the result of an earlier parse at this token, if no
+            # edit has touched it
+            k: int = self.profile_index[f.name]
+            stmts: List[Stmt] = f.body
+            value: Optional[str] = None
+            if stmts and isinstance(stmts[-1], Return):
+                stmts, value = stmts[:-1], stmts[-1].value
+            self.emit(f"{indent}_memo_ = self._reuse({k})")
+            self.emit(f"{indent}if _memo_ is not None:")
+            self.emit(f"{indent}{self.indent}return _memo_.value")
+            self.emit(f"{indent}_memo_ = self._begin()")
+            self.emit_stmts(stmts, indent)
+            self.emit(f"{indent}return self._end(_memo_, {k}, {value})")
+            return
+        if self.events:
+            # the exit event comes before the value is returned
+            stmts: List[Stmt] = f.body
+            ret: List[Stmt] = []
+            if stmts and isinstance(stmts[-1], Return):
+                stmts, ret = stmts[:-1], stmts[-1:]
+            self.emit(f"{indent}self._enter({f.name!r})")
+            self.emit_stmts(stmts, indent)
+            self.emit(f"{indent}self._exit({f.name!r})")
+            for s in ret:
+                self.stmt(s, indent)
+            return
+        if self.cst:
+            indent1: str = indent + self.indent
+            self.emit(f"{indent}_node_ = self._open({self.node_ids[f.name]})")
+            self.emit(f"{indent}try:")
+            self.emit_stmts(f.body, indent1)
+            self.emit(f"{indent}finally:")
+            self.emit(f"{indent1}self._close(_node_)")
+            return
+        if not self.recover:
+            self.emit_stmts(f.body, indent)
+            return
+        # panic mode: skip to a token that can follow this production
+        indent1: str = indent + self.indent
+        self.emit(f"{indent}try:")
+        self.emit_stmts(f.body, indent1)
+        self.emit(f"{indent}except Exception as e:")
+        self.emit(f"{indent1}self._recover(e, {set_repr(f.follow | {'EOF'})})")
+
+    def profiled_body(self, f: Function) -> None:
+        # time and tokens are inclusive, and are only added when the
+        # outermost activation of a recursive production returns
+        i2: str = self.indent * 2
+        i3: str = self.indent * 3
+        k: int = self.profile_index[f.name]
+        self.emit(f"{i2}_profile_start = perf_counter()")
+        self.emit(f"{i2}_profile_tokens = self._profile_consumed")
+        self.emit(f"{i2}self._profile_calls[{k}] += 1")
+        self.emit(f"{i2}self._profile_active[{k}] += 1")
+        self.emit(f"{i2}try:")
+        self.body(f, i3)
+        self.emit(f"{i2}finally:")
+        self.emit(f"{i3}self._profile_active[{k}] -= 1")
+        self.emit(f"{i3}if not self._profile_active[{k}]:")
+        self.emit(
+            f"{i3}{self.indent}self._profile_time[{k}] += perf_counter() - _profile_start"
+        )
+        self.emit(
+            f"{i3}{self.indent}self._profile_tokens[{k}] += self._profile_consumed - _profile_tokens"
+        )
+
     def emit_program(self) -> None:
         ssym: str = self.program.start_nonterminal
         rettype: str = (
@@ -143,35 +506,391 @@ class Emitter:
         )
         retsuffix: str = f"->{rettype}" if rettype else ""
         varsuffix: str = f":{rettype}" if rettype else ""
+        start: str = f"self.{self.prefix}{ssym}()"
+        if ssym in self.generators:
+            start = f"self._run({start})"
+        driver: str = (
+            f"""
+    def _run(self, gen: Generator) -> Any:
+        # drive the production generators with an explicit stack of
+        # suspended callers instead of the Python call stack
+        stack: list[Generator] = []
+        value: Any = None
+        exc: Exception | None = None
+        while True:
+            try:
+                if exc is None:
+                    callee = gen.send(value)
+                else:
+                    callee = gen.throw(exc)
+                    exc = None
+            except StopIteration as done:
+                if not stack:
+                    return done.value
+                gen = stack.pop()
+                value = done.value
+                continue
+            except Exception as e:
+                if not stack:
+                    raise
+                gen = stack.pop()
+                exc = e
+                continue
+            stack.append(gen)
+            gen = callee
+            value = None
+"""
+            if self.generators
+            else ""
+        )
 
-        prologue: str = f"""
-from typing import NoReturn, Iterable, Iterator
+        names: str = "".join(f"{f.name!r}, " for f in self.program.functions)
+        branches: str = "".join(f"{key!r}, " for key in self.branch_index)
+        # the default parser imports only what the original one did
+        typing_imports: str = (", Generator" if self.stack or self.push else "") + (
+            ", Any"
+            if self.stack
+            or self.push
+            or self.profile
+            or self.events
+            or self.incremental
+            or self.lazy
+            else ""
+        )
+        events_imports: str = ", Callable" if self.events else ""
+        profile_imports: str = (
+            "\nimport json\nfrom time import perf_counter\n" if self.profile else ""
+        )
+        profile_init: str = (
+            f"""
+        self._profile_consumed: int = 0
+        self._profile_calls: list[int] = [0] * {len(self.program.functions)}
+        self._profile_active: list[int] = [0] * {len(self.program.functions)}
+        self._profile_tokens: list[int] = [0] * {len(self.program.functions)}
+        self._profile_time: list[float] = [0.0] * {len(self.program.functions)}
+        self._profile_branches: list[int] = [0] * {len(self.branch_index)}"""
+            if self.profile
+            else ""
+        )
+        profile_count: str = (
+            "\n                self._profile_consumed += 1" if self.profile else ""
+        )
+        profile_methods: str = (
+            f"""
+    _profile_names: tuple[str, ...] = ({names})
 
-class ParseErrorException(Exception):
-    msg: str
-    token: Token
-    expected: set[str]
+    def profile(self) -> dict[str, dict[str, Any]]:
+        return {{
+            name: {{
+                "calls": self._profile_calls[i],
+                "tokens": self._profile_tokens[i],
+                "time": self._profile_time[i],
+            }}
+            for i, name in enumerate(self._profile_names)
+            if self._profile_calls[i]
+        }}
 
-    def __init__(self, msg: str, current: Token, expected: set[str]):
-        self.msg = msg
-        self.current = current
-        self.expected = expected
+    def profile_json(self) -> str:
+        return json.dumps(self.profile(), indent=1)
+
+    _profile_branch_keys: tuple[tuple[str, str], ...] = ({branches})
+
+    def branch_profile(self) -> dict[str, dict[str, int]]:
+        result: dict[str, dict[str, int]] = {{}}
+        for (label, guard), n in zip(self._profile_branch_keys, self._profile_branches):
+            result.setdefault(label, {{}})[guard] = n
+        return result
+
+    def record_branch_profile(self, path: str) -> None:
+        # add this parser's branch counts to those already in the file
+        try:
+            with open(path, "r") as f:
+                data: dict[str, dict[str, int]] = json.load(f)
+        except FileNotFoundError:
+            data = {{}}
+        for label, counts in self.branch_profile().items():
+            total: dict[str, int] = data.setdefault(label, {{}})
+            for guard, n in counts.items():
+                total[guard] = total.get(guard, 0) + n
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+"""
+            if self.profile
+            else ""
+        )
+
+        recover_class: str = (
+            """
+
+class ParseErrorsException(Exception):
+    errors: list[ParseErrorException]
+
+    def __init__(self, errors: list[ParseErrorException]):
+        self.errors = errors
 
     def __str__(self) -> str:
-        return f"Parse error {{self.msg}} at {{self.current}}:  Expected {{self.expected}}"
+        return "\\n".join(str(e) for e in self.errors)
+"""
+            if self.recover
+            else ""
+        )
+        recover_param: str = (
+            "\n        max_errors: int = 100," if self.recover else ""
+        )
+        events_param: str = "\n        handler: Any," if self.events else ""
+        events_init: str = (
+            """
+        # the handler's methods are looked up once
+        self.handler: Any = handler
+        self._enter: Callable[[str], Any] = handler.enter
+        self._exit: Callable[[str], Any] = handler.exit
+        self._token: Callable[[Token], Any] = handler.token"""
+            if self.events
+            else ""
+        )
+        recover_init: str = (
+            """
+        self.max_errors: int = max_errors"""
+            if self.recover
+            else ""
+        )
+        recover_reset: str = (
+            """
+        self.errors: list[ParseErrorException] = []
+        self._resumed_at: Token | None = None"""
+            if self.recover
+            else ""
+        )
+        recover_method: str = (
+            """
+    def _recover(self, e: Exception, sync: set[str]) -> None:
+        if not isinstance(e, ParseErrorException):
+            # once there is a syntax error, parse() will not return a value,
+            # so code that fails on the values of failed productions is moot
+            if not self.errors or isinstance(e, ParseErrorsException):
+                raise e
+            return
+        if self._current is self._resumed_at:
+            # no progress since the last recovery: do not report the same
+            # error again, and skip the offending token
+            if self.current() == "EOF":
+                raise e
+            self._advance()
+        else:
+            self.errors.append(e)
+            if len(self.errors) >= self.max_errors:
+                raise ParseErrorsException(self.errors)
+        while self.current() not in sync and self.current() != "EOF":
+            self._advance()
+        self._resumed_at = self._current
 
+    def _advance(self) -> None:
+        try:
+            self._current = next(self.scanner)
+        except StopIteration:
+            pass
+"""
+            if self.recover
+            else ""
+        )
+        parse_body: str = (
+            f"""
+        # parse the start symbol again after any error that reaches the top
+        while True:
+            try:
+                v {varsuffix}= {start}
+                self.match("EOF")
+                break
+            except ParseErrorException as e:
+                if self._current is not self._resumed_at:
+                    self.errors.append(e)
+                    if len(self.errors) >= self.max_errors:
+                        break
+                if self.current() == "EOF":
+                    break
+                self._advance()
+                self._resumed_at = self._current
+        if self.errors:
+            raise ParseErrorsException(self.errors)
+        return v"""
+            if self.recover
+            else f"""
+        v {varsuffix}= {start}
+        self.match("EOF")
+        return v"""
+        )
 
+        validate_method: str = (
+            f"""
+    def validate(self) -> Token | None:
+        # None if the tokens are a sentence of the grammar, and otherwise
+        # the token at which they were rejected
+        if self._v_{ssym}() and self._current.kind == "EOF":
+            return None
+        return self._current
+"""
+            if self.validate
+            else ""
+        )
 
-class Parser:
-    scanner:Iterator[Token]
-    _current:Token
+        push_imports: str = "\nfrom typing import AsyncIterable" if self.push else ""
+        push_driver: str = f"""
+    def feed(self, token: Token) -> bool:
+        # run the parser up to its need for the next token; returns whether
+        # it needs more input (otherwise the value is in self.result)
+        if self._gen is None:
+            raise ValueError("the parse is complete")
+        self._current = token
+        gen: Generator = self._gen
+        value: Any = None
+        exc: Exception | None = None
+        while True:
+            try:
+                if exc is None:
+                    callee = gen.send(value)
+                else:
+                    callee = gen.throw(exc)
+                    exc = None
+            except StopIteration as done:
+                if not self._stack:
+                    self._gen = None
+                    self.result = done.value
+                    return False
+                gen = self._stack.pop()
+                value = done.value
+                continue
+            except Exception as e:
+                if not self._stack:
+                    self._gen = None
+                    raise
+                gen = self._stack.pop()
+                exc = e
+                continue
+            if callee is None:
+                self._gen = gen
+                return True
+            self._stack.append(gen)
+            gen = callee
+            value = None
+
+    async def feed_async(self, tokens: AsyncIterable[Token]) -> Any:
+        async for token in tokens:
+            if not self.feed(token):
+                return self.result
+        self.error("end of input", {{"EOF"}})
 
+    def _push_start(self) -> Generator:
+        v = yield {start}
+        self.match("EOF")
+        return v
+"""
+        if self.push:
+            driver = push_driver
+            parse_body = """
+        for token in self.scanner:
+            if not self.feed(token):
+                return self.result
+        self.error("end of input", {"EOF"})"""
+        profile_reset: str = (
+            """
+        self.reset(scanner)
+
+    def reset(self, scanner: Iterable[Token]) -> None:
+        # start on new input, keeping the profile counts"""
+            if self.profile
+            else ""
+        )
+        events_token: str = "\n            self._token(prev)" if self.events else ""
+        cst_tree: str = (
+            "\n        self.tree: SyntaxTree = SyntaxTree()" if self.cst else ""
+        )
+        cst_reset: str = "\n        self._pos: int = 0" + cst_tree if self.cst else ""
+        cst_leaf: str = (
+            """
+            t: SyntaxTree = self.tree
+            t.kinds.append(NODE_IDS[kind])
+            t.first.append(-1)
+            t.next.append(len(t.kinds))
+            t.starts.append(self._pos)
+            t.ends.append(self._pos + 1)"""
+            if self.cst
+            else ""
+        )
+        cst_count: str = "\n                self._pos += 1" if self.cst else ""
+        cst_column_leaf: str = (
+            """
+            t: SyntaxTree = self.tree
+            t.kinds.append(kind)
+            t.first.append(-1)
+            t.next.append(len(t.kinds))
+            t.starts.append(self._pos)
+            t.ends.append(self._pos + 1)"""
+            if self.cst
+            else ""
+        )
+        cst_methods: str = (
+            """
+    def _open(self, kind: int) -> int:
+        t: SyntaxTree = self.tree
+        n: int = len(t.kinds)
+        t.kinds.append(kind)
+        t.first.append(-1)
+        t.next.append(-1)
+        t.starts.append(self._pos)
+        t.ends.append(self._pos)
+        return n
+
+    def _close(self, n: int) -> None:
+        # nodes are numbered in preorder: the first child is the next node,
+        # and every child's next is the node after it, except that the last
+        # child has none
+        t: SyntaxTree = self.tree
+        m: int = len(t.kinds)
+        t.ends[n] = self._pos
+        if n:
+            t.next[n] = m
+        if m > n + 1:
+            t.first[n] = n + 1
+            next: array = t.next
+            c: int = n + 1
+            while next[c] != m:
+                c = next[c]
+            next[c] = -1
+"""
+            if self.cst
+            else ""
+        )
+        core: str = (
+            """
     def __init__(
         self,
-        scanner: Iterable[Token],
+        scanner: Iterable[Token] = (),
     ):
+        self.reset(scanner)
+
+    def reset(self, scanner: Iterable[Token] = ()) -> None:
         self.scanner: Iterator[Token] = iter(scanner)
-        self._current = next(self.scanner)
+        self._stack: list[Generator] = []
+        self._gen: Generator | None = self._push_start()
+        self.result: Any = None
+
+    def error(self, msg: str, expected: set[str]) -> NoReturn:
+        raise ParseErrorException(msg, self._current, expected)
+
+    def match(self, kind: str)->Token:
+        # the caller yields for the next token to be fed
+        if self.current() == kind:
+            return self._current
+        else:
+            self.error("", {kind})"""
+            if self.push
+            else f"""
+    def __init__(
+        self,
+        scanner: Iterable[Token],{recover_param}{events_param}
+    ):{profile_init}{recover_init}{events_init}{profile_reset}
+        self.scanner: Iterator[Token] = iter(scanner)
+        self._current = next(self.scanner){recover_reset}{cst_reset}
     
 
     def error(self, msg: str, expected: set[str]) -> NoReturn:
@@ -179,23 +898,409 @@ class Parser:
 
     def match(self, kind: str)->Token:
         if self.current() == kind:
-            prev: Token = self._current
+            prev: Token = self._current{cst_leaf}{events_token}
             try:
-                self._current = next(self.scanner)
+                self._current = next(self.scanner){profile_count}{cst_count}
             except StopIteration:
                 pass
             return prev
         else:
-            self.error("", {{kind}})
+            self.error("", {{kind}})"""
+        )
+        current_kind: str = "self._current.kind"
+        columnar_imports: str = (
+            "\nfrom array import array" if self.columnar or self.cst else ""
+        )
+        columnar_classes: str = ""
+        cst_classes: str = ""
+        if self.cst:
+            node_kinds: str = "".join(
+                f"{k!r}, " for k in list(self.kind_ids) + list(self.node_ids)
+            )
+            cst_classes = f"""
 
-    def current(self)->str:
-        return self._current.kind
+NODE_KINDS: tuple[str, ...] = ({node_kinds})
+NODE_IDS: dict[str, int] = {{k: i for i, k in enumerate(NODE_KINDS)}}
+TERMINALS: int = {len(self.kind_ids)}
 
-    def parse(self) {retsuffix}:
-        v {varsuffix}= self.{self.prefix}{self.program.start_nonterminal}()
-        self.match("EOF")
-        return v
+
+class SyntaxTree:
+    # node i has kind NODE_KINDS[kinds[i]] and spans tokens starts[i] up to
+    # ends[i]; its children are first[i], next[first[i]], ... up to -1.
+    # Nodes are numbered in preorder, so the root is 0.
+    def __init__(self):
+        self.kinds = array("H")
+        self.first = array("i")
+        self.next = array("i")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def cursor(self, node: int = 0) -> "TreeCursor":
+        return TreeCursor(self, node)
+
+
+class TreeCursor:
+    # walks a SyntaxTree without creating an object per node
+    __slots__ = ("tree", "node", "parents")
+
+    def __init__(self, tree: SyntaxTree, node: int = 0):
+        self.tree = tree
+        self.node = node
+        self.parents: list[int] = []
+
+    @property
+    def kind(self) -> str:
+        return NODE_KINDS[self.tree.kinds[self.node]]
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.tree.kinds[self.node] < TERMINALS
+
+    @property
+    def start(self) -> int:
+        return self.tree.starts[self.node]
+
+    @property
+    def end(self) -> int:
+        return self.tree.ends[self.node]
+
+    def goto_first_child(self) -> bool:
+        child: int = self.tree.first[self.node]
+        if child < 0:
+            return False
+        self.parents.append(self.node)
+        self.node = child
+        return True
+
+    def goto_next_sibling(self) -> bool:
+        sibling: int = self.tree.next[self.node]
+        if sibling < 0:
+            return False
+        self.node = sibling
+        return True
+
+    def goto_parent(self) -> bool:
+        if not self.parents:
+            return False
+        self.node = self.parents.pop()
+        return True
+
+    def children(self) -> Iterator[int]:
+        child: int = self.tree.first[self.node]
+        while child >= 0:
+            yield child
+            child = self.tree.next[child]
+"""
+            if not self.columnar:
+                # the tree ends with the start symbol, not at EOF
+                parse_body = parse_body.replace(
+                    'self.match("EOF")',
+                    'if self.current() != "EOF":\n            self.error("", {"EOF"})',
+                )
+        if self.columnar:
+            kinds: str = "".join(f"{k!r}, " for k in self.kind_ids)
+            columnar_classes = f"""
+
+KINDS: tuple[str, ...] = ({kinds})
+KIND_IDS: dict[str, int] = {{k: i for i, k in enumerate(KINDS)}}
+
+
+class TokenColumns:
+    # token i has kind names[kinds[i]] and value source[starts[i]:ends[i]];
+    # the last token must be EOF (kind 0)
+    def __init__(
+        self,
+        source: str,
+        kinds: array,
+        starts: array,
+        ends: array,
+        names: list[str] | None = None,
+    ):
+        self.source = source
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.names: list[str] = names if names is not None else list(KINDS)
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[Token]) -> "TokenColumns":
+        # kinds the grammar does not use get numbers past those of KINDS
+        names: list[str] = list(KINDS)
+        ids: dict[str, int] = dict(KIND_IDS)
+        kinds = array("H")
+        starts = array("I")
+        ends = array("I")
+        parts: list[str] = []
+        offset = 0
+        for t in tokens:
+            k = ids.get(t.kind)
+            if k is None:
+                k = ids[t.kind] = len(names)
+                names.append(t.kind)
+            kinds.append(k)
+            starts.append(offset)
+            offset += len(t.value)
+            ends.append(offset)
+            parts.append(t.value)
+        if not kinds or kinds[-1] != 0:
+            kinds.append(0)
+            starts.append(offset)
+            ends.append(offset)
+        return cls("".join(parts), kinds, starts, ends, names)
+
+
+class ColumnToken:
+    # a token of a TokenColumns; its value is sliced only when read
+    __slots__ = ("columns", "index")
+
+    def __init__(self, columns: TokenColumns, index: int):
+        self.columns = columns
+        self.index = index
+
+    @property
+    def kind(self) -> str:
+        return self.columns.names[self.columns.kinds[self.index]]
+
+    @property
+    def value(self) -> str:
+        c = self.columns
+        return c.source[c.starts[self.index] : c.ends[self.index]]
+
+    @property
+    def start(self) -> int:
+        return self.columns.starts[self.index]
+
+    @property
+    def end(self) -> int:
+        return self.columns.ends[self.index]
+
+    def __repr__(self) -> str:
+        return f"ColumnToken({{self.kind!r}}, {{self.value!r}}, {{self.start}})"
+"""
+            core = f"""
+    def __init__(self, columns: TokenColumns):
+        self.reset(columns)
+
+    def reset(self, columns: TokenColumns) -> None:
+        # start on new input, keeping everything else
+        self.columns: TokenColumns = columns
+        self._kinds: array = columns.kinds
+        self._pos: int = 0
+        self._kind: int = self._kinds[0]{cst_tree}
+
+    def error(self, msg: str, expected: set[str]) -> NoReturn:
+        raise ParseErrorException(msg, ColumnToken(self.columns, self._pos), expected)
+
+    def match(self, kind: int) -> ColumnToken:
+        if self._kind == kind:
+            token = ColumnToken(self.columns, self._pos){cst_column_leaf}
+            self._pos += 1
+            self._kind = self._kinds[self._pos]
+            return token
+        else:
+            self.error("", {{self.columns.names[kind]}})
+
+    def skip(self, kind: int) -> None:
+        if self._kind == kind:{cst_column_leaf}
+            self._pos += 1
+            self._kind = self._kinds[self._pos]
+        else:
+            self.error("", {{self.columns.names[kind]}})"""
+            current_kind = "self.columns.names[self._kind]"
+            parse_body = f"""
+        v {varsuffix}= {start}
+        if self._kind:
+            self.error("", {{"EOF"}})
+        return v"""
+        incremental_classes: str = ""
+        if self.incremental:
+            incremental_classes = """
+
+
+class MemoEntry:
+    # a production parsed at some token: the number of tokens it consumed
+    # (-1 once an edit touches them or the token after them), its value,
+    # and the entry of the production that called it
+    __slots__ = ("start", "length", "value", "parent")
+
+    def __init__(self, start: int, parent: "MemoEntry | None"):
+        self.start = start
+        self.length = -1
+        self.value: Any = None
+        self.parent = parent
+"""
+            core = """
+    def __init__(self, tokens: Iterable[Token]):
+        self.reset(tokens)
+
+    def reset(self, tokens: Iterable[Token]) -> None:
+        # start on new input, forgetting every earlier parse
+        self.tokens: list[Token] = list(tokens)
+        # per token, the productions parsed there
+        self._memo: list[dict[int, MemoEntry] | None] = [None] * len(self.tokens)
+        self._pos: int = 0
+        self._current: Token = self.tokens[0]
+        self._active: MemoEntry | None = None
+
+    def edit(self, start: int, end: int, tokens: Iterable[Token]) -> None:
+        # replace self.tokens[start:end]; the next parse() reuses every
+        # production whose tokens (and the token after them) are unchanged,
+        # including those an earlier parse left unused
+        new: list[Token] = list(tokens)
+        for p in range(start):
+            memo: dict[int, MemoEntry] | None = self._memo[p]
+            if memo is not None:
+                for e in memo.values():
+                    if p + e.length >= start:
+                        e.length = -1
+        self.tokens[start:end] = new
+        self._memo[start:end] = [None] * len(new)
+
+    def error(self, msg: str, expected: set[str]) -> NoReturn:
+        raise ParseErrorException(msg, self._current, expected)
+
+    def match(self, kind: str) -> Token:
+        if self._current.kind == kind:
+            prev: Token = self._current
+            self._pos += 1
+            self._current = self.tokens[self._pos]
+            return prev
+        else:
+            self.error("", {kind})
+
+    def _reuse(self, k: int) -> MemoEntry | None:
+        memo: dict[int, MemoEntry] | None = self._memo[self._pos]
+        if memo is None:
+            return None
+        e: MemoEntry | None = memo.get(k)
+        if e is None or e.length < 0:
+            return None
+        self._pos += e.length
+        self._current = self.tokens[self._pos]
+        return e
+
+    def _begin(self) -> MemoEntry:
+        e = MemoEntry(self._pos, self._active)
+        self._active = e
+        return e
+
+    def _end(self, e: MemoEntry, k: int, value: Any) -> Any:
+        e.length = self._pos - e.start
+        e.value = value
+        self._active = e.parent
+        memo: dict[int, MemoEntry] | None = self._memo[e.start]
+        if memo is None:
+            memo = self._memo[e.start] = {}
+        memo[k] = e
+        return value"""
+            parse_body = f"""
+        self._pos = 0
+        self._current = self.tokens[0]
+        self._active = None
+        v {varsuffix}= {start}
+        if self._current.kind != "EOF":
+            self.error("", {{"EOF"}})
+        return v"""
+
+        lookahead_class: str = ""
+        lookahead_method: str = ""
+        k: int = self.program.lookahead
+        if k > 1 and self.columnar:
+            lookahead_method = """
+    def _lookahead(self, n: int) -> tuple[int, ...]:
+        # the kinds of the next n tokens; past the end of the input, EOF
+        kinds: array = self._kinds
+        last: int = len(kinds) - 1
+        return tuple(kinds[min(self._pos + i, last)] for i in range(n))
+"""
+        elif k > 1 and self.incremental:
+            lookahead_method = """
+    def _lookahead(self, n: int) -> tuple[str, ...]:
+        # the kinds of the next n tokens; past the end of the input, EOF
+        tokens: list[Token] = self.tokens
+        last: int = len(tokens) - 1
+        return tuple(tokens[min(self._pos + i, last)].kind for i in range(n))
 """
+            core = core.replace(
+                "if p + e.length >= start:",
+                f"if p + e.length + {k - 1} >= start:",
+            )
+        elif k > 1:
+            lookahead_class = f"""
+
+
+class TokenWindow:
+    # the scanner, read {k - 1} token(s) ahead into a ring buffer, so that the
+    # parser can see the tokens after the current one without consuming them
+    __slots__ = ("tokens", "ring", "head")
+
+    def __init__(self, tokens: Iterator[Token], size: int):
+        self.tokens = tokens
+        self.ring: list[Token | None] = [next(tokens, None) for _ in range(size)]
+        self.head: int = 0
+
+    def __iter__(self) -> "TokenWindow":
+        return self
+
+    def __next__(self) -> Token:
+        token: Token | None = self.ring[self.head]
+        if token is None:
+            raise StopIteration
+        self.ring[self.head] = next(self.tokens, None)
+        self.head = (self.head + 1) % len(self.ring)
+        return token
+
+    def peek(self, i: int) -> Token | None:
+        # the i-th token after the one last returned, counting from 0
+        return self.ring[(self.head + i) % len(self.ring)]
+"""
+            lookahead_method = """
+    def _lookahead(self, n: int) -> tuple[str, ...]:
+        # the kinds of the current and the next n - 1 tokens; past the end of
+        # the input, EOF
+        window: TokenWindow = self.scanner
+        kinds: list[str] = [self._current.kind]
+        for i in range(n - 1):
+            token: Token | None = window.peek(i)
+            kinds.append("EOF" if token is None else token.kind)
+        return tuple(kinds)
+"""
+            core = core.replace(
+                "self.scanner: Iterator[Token] = iter(scanner)",
+                f"self.scanner: Iterator[Token] = TokenWindow(iter(scanner), {k - 1})",
+            )
+
+        prologue: str = f"""
+from typing import NoReturn, Iterable, Iterator{typing_imports}{events_imports}{profile_imports}{push_imports}{columnar_imports}
+
+class ParseErrorException(Exception):
+    msg: str
+    token: Token
+    expected: set[str]
+
+    def __init__(self, msg: str, current: Token, expected: set[str]):
+        self.msg = msg
+        self.current = current
+        self.expected = expected
+
+    def __str__(self) -> str:
+        return f"Parse error {{self.msg}} at {{self.current}}:  Expected {{self.expected}}"
+{recover_class}{columnar_classes}{cst_classes}{incremental_classes}{lookahead_class}
+
+
+class Parser:
+    scanner:Iterator[Token]
+    _current:Token
+{core}
+
+    def current(self)->str:
+        return {current_kind}
+{cst_methods}{profile_methods}{recover_method}{lookahead_method}{driver}
+    def parse(self) {retsuffix}:{parse_body}
+{validate_method}"""
 
         for p in self.program.prologue:
             self.emit(p)
@@ -204,3 +1309,99 @@ class Parser:
 
         for f in self.program.functions:
             self.function(f)
+
+        for l in self.program.ladders:
+            self.ladder(l)
+
+        if self.validate:
+            self.validators()
+
+        if self.lazy:
+            self.emit()
+            self.lazy_loader()
+
+    def validators(self) -> None:
+        # ladders are validated with the productions they replaced
+        bodies: Dict[str, List[Stmt]] = {
+            f.name: f.body for f in self.program.functions if not f.params
+        }
+        for l in self.program.ladders:
+            for r in l.rungs:
+                bodies[r.nonterm] = r.body
+        for name, body in bodies.items():
+            self.validator(name, body)
+
+    def lazy_loader(self) -> None:
+        # each method starts out as a descriptor that compiles the method's
+        # source and replaces itself with the function when first looked up
+        self.emit("_lazy_sources: dict[str, str] = {")
+        for name, source in self.lazy_sources.items():
+            self.emit(f"    {name!r}: {source!r},")
+        self.emit("}")
+        self.emit(
+            """
+
+class _LazyMethod:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, obj: Any, cls: type) -> Any:
+        namespace: dict[str, Any] = {}
+        exec(_lazy_sources[self.name], globals(), namespace)
+        setattr(Parser, self.name, namespace[self.name])
+        return getattr(Parser, self.name).__get__(obj, cls)
+
+
+for _name in _lazy_sources:
+    setattr(Parser, _name, _LazyMethod(_name))"""
+        )
+
+    def ladder(self, l: Ladder) -> None:
+        # precedence climbing: parse the primary once, then apply only the
+        # rungs whose operator is next (or that compute a value of their own)
+        name: str = f"{l.name}__climb"
+        method: str = f"{self.prefix}{name}"
+        ops: str = ", ".join(
+            f"{self.kind_ids[kind_name(op)] if self.columnar else term_repr(op)}: {level}"
+            for level, r in enumerate(l.rungs)
+            for op in sorted(r.ops)
+        )
+        current: str = "self._kind" if self.columnar else "self.current()"
+        opaque: List[int] = []
+        for level, r in enumerate(l.rungs):
+            opaque.append(level if r.opaque else opaque[-1] if opaque else -1)
+        rests: str = ", ".join(
+            repr(f"{self.prefix}{r.rest}") if self.lazy else f"{self.prefix}{r.rest}"
+            for r in l.rungs
+        )
+        i1: str = self.indent
+        i2: str = self.indent * 2
+        i3: str = self.indent * 3
+        i4: str = self.indent * 4
+        self.function_name = name
+        primary: str = self.call(l.primary, f"self.{self.prefix}{l.primary}()")
+        dispatch: str = (
+            f"getattr(self, self.{method}_rest[j])(v)"
+            if self.lazy
+            else f"self.{method}_rest[j](self, v)"
+        )
+        rest: str = self.call(l.rungs[0].rest, dispatch)
+        self.emit(f"{i1}{method}_ops = {{{ops}}}")
+        self.emit(f"{i1}{method}_opaque = ({', '.join(map(str, opaque))},)")
+        self.emit(f"{i1}{method}_rest = ({rests},)")
+        self.emit()
+        self.emit(f"{i1}def {method}(self, level: int):")
+        self.emit(f"{i2}v = {primary}")
+        self.emit(f"{i2}k = {len(l.rungs) - 1}")
+        self.emit(f"{i2}while k >= level:")
+        self.emit(f"{i3}j = self.{method}_ops.get({current}, -1)")
+        self.emit(f"{i3}if j > k:")
+        self.emit(f"{i4}j = -1")
+        self.emit(f"{i3}if j < self.{method}_opaque[k]:")
+        self.emit(f"{i4}j = self.{method}_opaque[k]")
+        self.emit(f"{i3}if j < level:")
+        self.emit(f"{i4}break")
+        self.emit(f"{i3}v = {rest}")
+        self.emit(f"{i3}k = j - 1")
+        self.emit(f"{i2}return v")
+        self.emit()
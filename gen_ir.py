@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 
 from .grammar import (
     Alts,
@@ -22,10 +22,23 @@ from .grammar import (
 )
 
 from . import ir
+from .inline import walk
 
 from .analysis import State
 
 
+def guards(functions: List[ir.Function]) -> List[ir.Guard]:
+    result: List[ir.Guard] = []
+    for f in functions:
+        for s in walk(f.body):
+            match s:
+                case ir.Loop(top, _, bottom):
+                    result += [g for g in (top, bottom) if g]
+                case ir.SelectAlternative(guardeds, _):
+                    result += [g.guard for g in guardeds]
+    return result
+
+
 def append(L: List[ir.Stmt], x: Optional[ir.Stmt]) -> None:
     if x and not isinstance(x, ir.Empty):
         L.append(x)
@@ -39,21 +52,29 @@ class Emitter:
         pragmas: Dict[str, Any],
         verbose: bool,
         decorate: bool,
+        climb: bool = False,
     ):
         self.spec: Spec = spec
         self.state: State = state
         self.pragmas: Dict[str, Any] = pragmas
         self.verbose: bool = verbose
         self.decorate: bool = decorate
+        self.climb: bool = climb
+        self.function_name: str = ""
+        self.branches: int = 0
 
     def alts(self, x: Alts) -> List[ir.Stmt]:
         guardeds: List[ir.Guarded] = []
         for v in x.vals:
-            guard: ir.Guard = ir.Guard(v.predict)
+            guard: ir.Guard = ir.Guard(v.predict, v.lookahead)
             body: List[ir.Stmt] = self.sequence(v)
             guardeds.append(ir.Guarded(guard, body))
 
-        if_ = ir.SelectAlternative(guardeds, ir.ParseError("syntax error"))
+        label: str = f"{self.function_name}:{self.branches}"
+        self.branches += 1
+        if_ = ir.SelectAlternative(
+            guardeds, ir.ParseError("syntax error"), label
+        )
         return [if_]
 
     def cons0(
@@ -96,11 +117,11 @@ class Emitter:
         return init + [loop]
 
     def rep(self, x: Rep) -> List[ir.Stmt]:
-        guard: ir.Guard = ir.Guard(x.val.predict)
+        guard: ir.Guard = ir.Guard(x.val.predict, x.val.lookahead)
         return self.loop_shared(x, guard, None)
 
     def oneplus(self, x: OnePlus) -> List[ir.Stmt]:
-        guard: ir.Guard = ir.Guard(x.val.predict)
+        guard: ir.Guard = ir.Guard(x.val.predict, x.val.lookahead)
         return self.loop_shared(x, None, guard)
 
     def infinite(self, x: Infinite) -> List[ir.Stmt]:
@@ -120,7 +141,7 @@ class Emitter:
             init = [ir.Empty()]
 
         guardeds: List[ir.Guarded] = [
-            ir.Guarded(ir.Guard(x.val.predict), self.expr(x.val))
+            ir.Guarded(ir.Guard(x.val.predict, x.val.lookahead), self.expr(x.val))
         ]
         if_ = ir.SelectAlternative(guardeds, None)
         return init + [if_]
@@ -187,6 +208,8 @@ class Emitter:
         ]
 
         name: str = p.lhs
+        self.function_name = name
+        self.branches = 0
         ret: Optional[ir.Return] = None
         tmps = []
         if self.decorate:
@@ -196,16 +219,178 @@ class Emitter:
         body: List[ir.Stmt] = self.sequence(p.rhs, tmps)
         if ret:
             body.append(ret)
-        return ir.Function(name, preamble + body)
+        follow: Set[str] = set(state.syms_follow[p.lhs].get_value())
+        return ir.Function(name, preamble + body, [], follow)
+
+    def operator(self, x: Expr) -> bool:
+        match x:
+            case Sym(value=v):
+                return v in self.state.terms
+            case Parens(e=e):
+                return self.operator(e)
+            case Alts(vals=vals):
+                return all(self.operator(v) for v in vals)
+            case Sequence(seq=Cons(car=car, cdr=Lambda())):
+                return self.operator(car)
+        return False
+
+    def only_values(self, x: Seq0) -> bool:
+        while isinstance(x, Cons):
+            if not isinstance(x.car, Value):
+                return False
+            x = x.cdr
+        return True
+
+    def rung(self, p: Production) -> Optional[Tuple[str, Set[str]]]:
+        # p: operand { operator operand } with only code after the operands
+        match p.rhs:
+            case Sequence(
+                seq=Cons(
+                    car=Sym(value=operand), cdr=Cons(car=Rep() as r, cdr=tail)
+                )
+            ):
+                pass
+            case _:
+                return None
+        if operand in self.state.terms or operand == p.lhs:
+            return None
+        if r.val.lookahead:
+            # climbing chooses by one token
+            return None
+        if not self.only_values(tail):
+            return None
+        match r.val:
+            case Sequence(seq=Cons(car=op, cdr=Cons(car=Sym(value=v), cdr=rest))):
+                if v != operand or not self.operator(op):
+                    return None
+                if not self.only_values(rest):
+                    return None
+            case _:
+                return None
+        return operand, set(r.val.predict)
+
+    def split_rung(
+        self, f: ir.Function, operand: str, ladder: str, level: Optional[int]
+    ) -> Tuple[ir.Function, bool]:
+        # turn the production into a method that continues the ladder with
+        # the value of its first operand passed in
+        body: List[ir.Stmt] = []
+        opaque: bool = True
+        param: str = "_"
+        for s in f.body:
+            if not isinstance(s, ir.Sequence):
+                body.append(s)
+                continue
+            stmts: List[ir.Stmt] = []
+            for t in s.stmts:
+                match t:
+                    case ir.NonTerminal(lhs, nonterm) if nonterm == operand:
+                        param = lhs or "_"
+                    case ir.Loop(top, loop, bottom) if level is not None:
+                        loop = self.climb_operand(loop, operand, ladder, level)
+                        stmts.append(ir.Loop(top, loop, bottom))
+                    case _:
+                        stmts.append(t)
+            body.append(ir.Sequence(s.decls, stmts))
+            rest: List[ir.Stmt] = [
+                t
+                for t in stmts
+                if not isinstance(t, (ir.Verbose, ir.Warning, ir.Comment))
+            ]
+            if rest and isinstance(rest[0], ir.Loop):
+                match rest[1:]:
+                    case []:
+                        opaque = self.decorate
+                    case [ir.Copy(lhs, rhs)]:
+                        opaque = lhs != f"_{f.name}_" or rhs.strip() != param
+        return ir.Function(f"{f.name}__rest", body, [param], f.follow), opaque
+
+    def climb_operand(
+        self, stmts: List[ir.Stmt], operand: str, ladder: str, level: int
+    ) -> List[ir.Stmt]:
+        result: List[ir.Stmt] = []
+        for s in stmts:
+            match s:
+                case ir.NonTerminal(lhs, nonterm) if nonterm == operand:
+                    result.append(ir.Climb(lhs, ladder, level))
+                case ir.Sequence(decls, body):
+                    result.append(
+                        ir.Sequence(
+                            decls, self.climb_operand(body, operand, ladder, level)
+                        )
+                    )
+                case _:
+                    result.append(s)
+        return result
+
+    def ladders(
+        self, functions: List[ir.Function]
+    ) -> Tuple[List[ir.Function], List[ir.Ladder]]:
+        # replace chains of productions of the form
+        #     a: b { op b } .   b: c { op c } .   ...
+        # by one precedence climbing loop
+        rungs: Dict[str, Tuple[str, Set[str]]] = {}
+        for p in self.spec.productions:
+            r = self.rung(p)
+            if r:
+                rungs[p.lhs] = r
+        operands: Set[str] = set(operand for operand, _ in rungs.values())
+        byname: Dict[str, ir.Function] = {f.name: f for f in functions}
+        claimed: Set[str] = set()
+        ladders: List[ir.Ladder] = []
+        for p in self.spec.productions:
+            if p.lhs not in rungs or p.lhs in operands:
+                continue
+            chain: List[str] = [p.lhs]
+            ops: Set[str] = set(rungs[p.lhs][1])
+            nt: str = rungs[p.lhs][0]
+            while nt in rungs and nt not in claimed and nt not in chain:
+                if ops & rungs[nt][1]:
+                    break
+                chain.append(nt)
+                ops |= rungs[nt][1]
+                nt = rungs[nt][0]
+            if len(chain) < 2:
+                continue
+            claimed.update(chain)
+            ladder = ir.Ladder(p.lhs, [], nt)
+            for level, name in enumerate(chain):
+                operand, ops = rungs[name]
+                next_level = level + 1 if level + 1 < len(chain) else None
+                rest, opaque = self.split_rung(
+                    byname[name], operand, ladder.name, next_level
+                )
+                functions.append(rest)
+                f = byname[name]
+                ladder.rungs.append(ir.Rung(name, ops, rest.name, opaque, f.body))
+                target: Optional[str] = f"_{name}_" if self.decorate else None
+                climb: List[ir.Stmt] = [
+                    ir.Sequence(
+                        [ir.Decl(target)] if target else [],
+                        [ir.Climb(target, ladder.name, level)],
+                    )
+                ]
+                if target:
+                    climb.append(ir.Return(target))
+                f.body = [
+                    s for s in f.body if isinstance(s, (ir.Comment, ir.Verbose))
+                ] + climb
+            ladders.append(ladder)
+        return functions, ladders
 
     def emit_parser(self, state: State) -> ir.Program:
         functions: List[ir.Function] = []
         for p in self.spec.productions:
             f: ir.Function = self.prod(p, state)
             functions.append(f)
+        ladders: List[ir.Ladder] = []
+        if self.climb:
+            functions, ladders = self.ladders(functions)
         return ir.Program(
             self.spec.productions[0].lhs,
             self.spec.preamble,
             functions,
             self.pragmas,
+            ladders,
+            max([1] + [len(s) for g in guards(functions) for s in g.lookahead or ()]),
         )
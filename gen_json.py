@@ -1,6 +1,6 @@
 import sys
 import json
-from typing import Any, TypedDict, Literal, NotRequired
+from typing import Any, Iterator, TextIO, TypedDict, Literal, NotRequired
 
 from .grammar import (
     Alts,
@@ -23,6 +23,7 @@ from .grammar import (
 
 from .analysis import State
 from .read import process_grammar
+from .jsonstream import write_lines, write_object
 
 
 class ExprDict(TypedDict):
@@ -270,7 +271,163 @@ class Emitter:
         return retval
 
 
-def analysis(infile: str, outfile: str) -> None:
+class CompactDict(TypedDict):
+    # expressions are numbered in a flat table (children before parents), and
+    # every set of terminals is stored once, as indexes into terminals
+    format: Literal["compact"]
+    terminals: list[str]
+    nonterminals: list[str]
+    start: str
+    pragmas: dict[str, Any]
+    sets: list[list[int]]
+    nodes: list[dict[str, Any]]
+    productions: list[dict[str, Any]]
+    analysis: dict[str, dict[str, Any]]
+
+
+class CompactEmitter:
+    def __init__(self, spec: Spec, state: State, reprs: bool = False):
+        self.spec: Spec = spec
+        self.state: State = state
+        self.reprs: bool = reprs
+        self.terminals: list[str] = ["EOF"] + sorted(state.terms - {"EOF"})
+        self.columns: dict[str, int] = {t: i for i, t in enumerate(self.terminals)}
+        self.set_ids: dict[frozenset[str], int] = {}
+        self.sets: list[list[int]] = []
+        self.nodes: list[dict[str, Any]] = []
+
+    def set_id(self, s: set[str]) -> int:
+        key: frozenset[str] = frozenset(s)
+        i: int | None = self.set_ids.get(key)
+        if i is None:
+            i = self.set_ids[key] = len(self.sets)
+            self.sets.append(sorted(self.columns[t] for t in key))
+        return i
+
+    def node(self, e: Expr) -> int:
+        retval: dict[str, Any]
+        match e:
+            case Alts(vals=vals):
+                retval = {"type": "alts", "vals": [self.node(v) for v in vals]}
+            case Sequence(seq=seq):
+                retval = {"type": "sequence", "seq": self.node(seq)}
+            case Rep(val=val):
+                retval = {"type": "rep", "val": self.node(val)}
+            case Opt(val=val):
+                retval = {"type": "opt", "val": self.node(val)}
+            case Sym(value=value):
+                retval = {"type": "sym", "value": value}
+            case Parens(e=x):
+                retval = {"type": "parens", "e": self.node(x)}
+            case Cons(car=car, cdr=cdr):
+                retval = {"type": "cons", "car": self.node(car), "cdr": self.node(cdr)}
+            case Lambda():
+                retval = {"type": "lambda"}
+            case Value(value=value):
+                retval = {"type": "value", "val": value}
+            case Break():
+                retval = {"type": "break"}
+            case Continue():
+                retval = {"type": "continue"}
+            case OnePlus(val=val):
+                retval = {"type": "oneplus", "val": self.node(val)}
+            case Infinite(val=val):
+                retval = {"type": "infinite", "val": self.node(val)}
+            case _:
+                raise Exception(f"Expr not implemented {e}")
+        retval["nullable"] = e.nullable
+        retval["first"] = self.set_id(e.first)
+        retval["follow"] = self.set_id(e.follow)
+        retval["predict"] = self.set_id(e.predict)
+        if self.reprs:
+            retval["_str_"] = e.__repr__()
+        self.nodes.append(retval)
+        return len(self.nodes) - 1
+
+    def emit(self, pragmas: dict[str, Any]) -> CompactDict:
+        productions: list[dict[str, Any]] = [
+            {"lhs": p.lhs, "rhs": self.node(p.rhs)} for p in self.spec.productions
+        ]
+        ntanalysis: dict[str, dict[str, Any]] = {}
+        for nt in sorted(self.state.nonterms):
+            ntanalysis[nt] = {
+                "nullable": self.state.syms_nullable[nt].get_value(),
+                "first": self.set_id(self.state.syms_first[nt].get_value()),
+                "follow": self.set_id(self.state.syms_follow[nt].get_value()),
+            }
+        return {
+            "format": "compact",
+            "terminals": self.terminals,
+            "nonterminals": sorted(self.state.nonterms),
+            "start": self.spec.productions[0].lhs,
+            "pragmas": pragmas,
+            "sets": self.sets,
+            "nodes": self.nodes,
+            "productions": productions,
+            "analysis": ntanalysis,
+        }
+
+
+def nonterminal_analysis(state: State, nt: str) -> AnalysisDict:
+    return {
+        "nullable": state.syms_nullable[nt].get_value(),
+        "first": sorted(list(state.syms_first[nt].get_value())),
+        "follow": sorted(list(state.syms_follow[nt].get_value())),
+    }
+
+
+def total(
+    spec: Spec, state: State, pragmas: dict[str, Any]
+) -> Iterator[tuple[str, Any]]:
+    # the fields of a TotalDict, with the productions analyzed one at a time
+    # as the spec is written
+    emitter = Emitter(spec, state)
+    yield "spec", (emitter.prod(p, state) for p in spec.productions)
+    yield "pragmas", pragmas
+    yield "terminals", sorted(list(state.terms))
+    yield "nonterminals", sorted(list(state.nonterms))
+    yield "start", spec.productions[0].lhs
+    yield "analysis", {nt: nonterminal_analysis(state, nt) for nt in state.nonterms}
+
+
+def lines(spec: Spec, state: State, pragmas: dict[str, Any]) -> Iterator[Any]:
+    # JSON Lines: the names, then a ProdDict per production, then the
+    # analysis of every nonterminal
+    yield {
+        "terminals": sorted(list(state.terms)),
+        "nonterminals": sorted(list(state.nonterms)),
+        "start": spec.productions[0].lhs,
+        "pragmas": pragmas,
+    }
+    emitter = Emitter(spec, state)
+    for p in spec.productions:
+        yield emitter.prod(p, state)
+    for nt in sorted(state.nonterms):
+        yield {"nonterminal": nt, "analysis": nonterminal_analysis(state, nt)}
+
+
+def write(
+    f: TextIO,
+    format: str,
+    reprs: bool,
+    spec: Spec,
+    state: State,
+    pragmas: dict[str, Any],
+) -> None:
+    match format:
+        case "compact":
+            compact: CompactDict = CompactEmitter(spec, state, reprs).emit(pragmas)
+            json.dump(compact, f, separators=(",", ":"))
+            f.write("\n")
+        case "jsonl":
+            write_lines(f, lines(spec, state, pragmas))
+        case _:
+            write_object(f, total(spec, state, pragmas), 4)
+
+
+def analysis(
+    infile: str, outfile: str, format: str = "json", reprs: bool = False
+) -> None:
     input: str
     if infile:
         with open(infile, "r") as f:
@@ -281,28 +438,24 @@ def analysis(infile: str, outfile: str) -> None:
     state: State
     pragmas: dict[str, Any]
     spec, state, pragmas = process_grammar(input)
-
-    emitter = Emitter(spec, state)
-    analyzed: list[ProdDict] = emitter.emit(state)
-    ntanalysis: dict[str, AnalysisDict] = {}
-    for nt in state.nonterms:
-        ntanalysis[nt] = {
-            "nullable": state.syms_nullable[nt].get_value(),
-            "first": sorted(list(state.syms_first[nt].get_value())),
-            "follow": sorted(list(state.syms_follow[nt].get_value())),
-        }
-    retval: TotalDict = {
-        "spec": analyzed,
-        "pragmas": pragmas,
-        "terminals": sorted(list(state.terms)),
-        "nonterminals": sorted(list(state.nonterms)),
-        "start": spec.productions[0].lhs,
-        "analysis": ntanalysis,
-    }
+    if format == "npz":
+        from . import gen_npz
+
+        if outfile:
+            with open(outfile, "wb") as b:
+                gen_npz.write(spec, state, b)
+        else:
+            gen_npz.write(spec, state, sys.stdout.buffer)
+        return
+    if format == "sqlite":
+        from . import gen_sqlite
+
+        if not outfile:
+            raise ValueError("--format sqlite needs an --output file")
+        gen_sqlite.write(spec, state, outfile)
+        return
     if outfile:
         with open(outfile, "w") as f:
-            json.dump(retval, f, indent=4)
-            f.write("\n")
+            write(f, format, reprs, spec, state, pragmas)
     else:
-        json.dump(retval, sys.stdout, indent=4)
-        sys.stdout.write("\n")
+        write(sys.stdout, format, reprs, spec, state, pragmas)
@@ -0,0 +1,70 @@
+from typing import Any, BinaryIO, Dict, List
+
+from .grammar import Alts, Cons, Expr, Lambda, Parens, Sequence, Spec
+from .analysis import State
+
+
+def alternatives(e: Expr) -> List[Expr]:
+    # the choices a production makes by its first token
+    match e:
+        case Sequence(seq=x) | Parens(e=x):
+            return alternatives(x)
+        case Cons(car=car, cdr=Lambda()):
+            return alternatives(car)
+        case Alts(vals=vals):
+            return vals
+    return [e]
+
+
+def tables(spec: Spec, state: State) -> Dict[str, Any]:
+    # the LL(1) analysis as dense arrays: a row per nonterminal (sorted) and
+    # a column per terminal (EOF, then the others sorted)
+    import numpy as np
+
+    terminals: List[str] = ["EOF"] + sorted(state.terms - {"EOF"})
+    nonterminals: List[str] = sorted(state.nonterms)
+    column: Dict[str, int] = {t: i for i, t in enumerate(terminals)}
+    row: Dict[str, int] = {nt: i for i, nt in enumerate(nonterminals)}
+    shape = (len(nonterminals), len(terminals))
+
+    nullable = np.zeros(len(nonterminals), dtype=bool)
+    first = np.zeros(shape, dtype=bool)
+    follow = np.zeros(shape, dtype=bool)
+    for nt, i in row.items():
+        nullable[i] = state.syms_nullable[nt].get_value()
+        first[i, [column[t] for t in state.syms_first[nt].get_value()]] = True
+        follow[i, [column[t] for t in state.syms_follow[nt].get_value()]] = True
+
+    # the alternative the parser takes (the first, where several predict
+    # the terminal, as in the generated code), or -1 for a syntax error
+    predict = np.full(shape, -1, dtype=np.int32)
+    conflicts = np.zeros(shape, dtype=bool)
+    counts = np.zeros(len(nonterminals), dtype=np.int32)
+    for p in spec.productions:
+        i = row[p.lhs]
+        vals: List[Expr] = alternatives(p.rhs)
+        counts[i] = len(vals)
+        for a in range(len(vals) - 1, -1, -1):
+            ts: List[int] = [column[t] for t in vals[a].predict]
+            conflicts[i, ts] |= predict[i, ts] >= 0
+            predict[i, ts] = a
+
+    return {
+        "terminals": np.array(terminals, dtype=str),
+        "nonterminals": np.array(nonterminals, dtype=str),
+        "start": np.int32(row[spec.productions[0].lhs]),
+        "nullable": nullable,
+        "first": first,
+        "follow": follow,
+        "predict": predict,
+        "conflicts": conflicts,
+        "alternatives": counts,
+    }
+
+
+def write(spec: Spec, state: State, file: BinaryIO) -> None:
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("--format npz requires numpy") from None
+    np.savez(file, **tables(spec, state))
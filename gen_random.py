@@ -1,7 +1,22 @@
 import random
-from typing import List
-
-from .grammar import Alts, Rep, Opt, Sym, Production, Expr, Cons
+from typing import Iterator, List
+
+from .grammar import (
+    Alts,
+    Rep,
+    Opt,
+    Sym,
+    Production,
+    Expr,
+    Cons,
+    Sequence,
+    Parens,
+    Lambda,
+    Value,
+    Exit,
+    OnePlus,
+    Infinite,
+)
 
 from .analysis import State
 
@@ -30,6 +45,15 @@ def rep(self: Rep, productions: list[Production], state: State) -> list[str]:
     return lexemes
 
 
+# oneplus
+def oneplus(self: OnePlus, productions: list[Production], state: State) -> list[str]:
+    lexemes: List[str] = gen_random(self.val, productions, state)
+    if count < 100:
+        for _ in range(random.randint(0, 2)):
+            lexemes += gen_random(self.val, productions, state)
+    return lexemes
+
+
 # opt
 def opt(self: Opt, productions: list[Production], state: State):
     lexemes: List[str] = []
@@ -62,8 +86,16 @@ def gen_random(
         return alts(e, productions, state)
     elif isinstance(e, Cons):
         return cons(e, productions, state)
-    elif isinstance(e, Rep):
+    elif isinstance(e, (Rep, Infinite)):
         return rep(e, productions, state)
+    elif isinstance(e, OnePlus):
+        return oneplus(e, productions, state)
+    elif isinstance(e, Sequence):
+        return gen_random(e.seq, productions, state)
+    elif isinstance(e, Parens):
+        return gen_random(e.e, productions, state)
+    elif isinstance(e, (Lambda, Value, Exit)):
+        return []
     elif isinstance(e, Opt):
         return opt(e, productions, state)
     elif isinstance(e, Sym):
@@ -83,11 +115,10 @@ def gen(e: Expr, productions: list[Production], state: State, max: int) -> str:
 
 def gen_examples(
     grammar: list[Production], state: State, quantity: int, limit: int
-) -> list[str]:
+) -> Iterator[str]:
     outputs: set[str] = set()
     while len(outputs) < quantity:
         out = gen(grammar[0].rhs, grammar, state, limit)
         if out not in outputs:
             outputs.add(out)
-    L = list(outputs)
-    return L
+            yield out
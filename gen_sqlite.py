@@ -0,0 +1,258 @@
+import hashlib
+import sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from .grammar import (
+    Alts,
+    Break,
+    Cons,
+    Continue,
+    Expr,
+    Infinite,
+    Lambda,
+    OnePlus,
+    Opt,
+    Parens,
+    Production,
+    Rep,
+    Sequence,
+    Spec,
+    Sym,
+    Value,
+)
+from .analysis import State
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    terminal INTEGER NOT NULL,
+    nullable INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS productions (
+    id INTEGER PRIMARY KEY,
+    lhs INTEGER NOT NULL UNIQUE REFERENCES symbols (id),
+    rhs INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    production INTEGER NOT NULL REFERENCES productions (id),
+    parent INTEGER REFERENCES nodes (id),
+    position INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    value TEXT,
+    nullable INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS nodes_production ON nodes (production);
+CREATE INDEX IF NOT EXISTS nodes_value ON nodes (value);
+CREATE TABLE IF NOT EXISTS node_sets (
+    node INTEGER NOT NULL REFERENCES nodes (id),
+    kind TEXT NOT NULL,
+    terminal INTEGER NOT NULL REFERENCES symbols (id),
+    PRIMARY KEY (node, kind, terminal)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS node_sets_terminal ON node_sets (terminal, kind);
+CREATE TABLE IF NOT EXISTS symbol_sets (
+    symbol INTEGER NOT NULL REFERENCES symbols (id),
+    kind TEXT NOT NULL,
+    terminal INTEGER NOT NULL REFERENCES symbols (id),
+    PRIMARY KEY (symbol, kind, terminal)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS symbol_sets_terminal ON symbol_sets (terminal, kind);
+"""
+
+TYPES: Dict[type, str] = {
+    Alts: "alts",
+    Sequence: "sequence",
+    Rep: "rep",
+    Opt: "opt",
+    Sym: "sym",
+    Parens: "parens",
+    Cons: "cons",
+    Lambda: "lambda",
+    Value: "value",
+    Break: "break",
+    Continue: "continue",
+    OnePlus: "oneplus",
+    Infinite: "infinite",
+}
+
+# a node of a production: its parent (as an index into the production's
+# nodes), position among its siblings, type, value, nullable, and its
+# FIRST, FOLLOW, and PREDICT
+Node = Tuple[
+    Optional[int], int, str, Optional[str], bool, List[str], List[str], List[str]
+]
+
+
+def children(e: Expr) -> List[Expr]:
+    match e:
+        case Alts(vals=vals):
+            return vals
+        case Cons(car=car, cdr=cdr):
+            return [car, cdr]
+        case Sequence(seq=x) | Parens(e=x):
+            return [x]
+        case Rep(val=x) | Opt(val=x) | OnePlus(val=x) | Infinite(val=x):
+            return [x]
+    return []
+
+
+def flatten(p: Production) -> List[Node]:
+    # the nodes of a production, in preorder
+    nodes: List[Node] = []
+    stack: List[Tuple[Expr, Optional[int], int]] = [(p.rhs, None, 0)]
+    while stack:
+        e, parent, position = stack.pop()
+        value: Optional[str] = e.value if isinstance(e, (Sym, Value)) else None
+        nodes.append(
+            (
+                parent,
+                position,
+                TYPES[type(e)],
+                value,
+                e.nullable,
+                sorted(e.first),
+                sorted(e.follow),
+                sorted(e.predict),
+            )
+        )
+        i: int = len(nodes) - 1
+        stack += reversed([(c, i, n) for n, c in enumerate(children(e))])
+    return nodes
+
+
+def symbol_ids(db: sqlite3.Connection, state: State) -> Dict[str, int]:
+    # the ids of symbols stay the same from one update to the next
+    db.executemany(
+        "INSERT INTO symbols (name, terminal, nullable) VALUES (?, ?, ?)"
+        " ON CONFLICT (name) DO UPDATE"
+        " SET terminal = excluded.terminal, nullable = excluded.nullable",
+        [(t, 1, 0) for t in sorted(state.terms | {"EOF"})]
+        + [
+            (nt, 0, int(state.syms_nullable[nt].get_value()))
+            for nt in sorted(state.nonterms)
+        ],
+    )
+    return dict(db.execute("SELECT name, id FROM symbols"))
+
+
+def update_production(
+    db: sqlite3.Connection,
+    p: Production,
+    position: int,
+    ids: Dict[str, int],
+    old: Optional[Tuple[int, str]],
+) -> bool:
+    # write a production's nodes unless they are the same as before
+    nodes: List[Node] = flatten(p)
+    text: str = p.rhs.__repr__()
+    digest: str = hashlib.sha256(repr((text, nodes)).encode()).hexdigest()
+    if old is not None and old[1] == digest:
+        db.execute(
+            "UPDATE productions SET position = ? WHERE id = ?", (position, old[0])
+        )
+        return False
+    if old is not None:
+        delete_production(db, old[0])
+    # the nodes are numbered after every node there is
+    base: int = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM nodes").fetchone()[0]
+    pid: int = db.execute(
+        "INSERT INTO productions (lhs, rhs, position, text, digest)"
+        " VALUES (?, ?, ?, ?, ?)",
+        (ids[p.lhs], base, position, text, digest),
+    ).lastrowid or 0
+    db.executemany(
+        "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                base + i,
+                pid,
+                None if parent is None else base + parent,
+                pos,
+                type_,
+                value,
+                int(nullable),
+            )
+            for i, (parent, pos, type_, value, nullable, _, _, _) in enumerate(nodes)
+        ],
+    )
+    db.executemany(
+        "INSERT INTO node_sets VALUES (?, ?, ?)",
+        [
+            (base + i, kind, ids[t])
+            for i, node in enumerate(nodes)
+            for kind, terminals in zip(("first", "follow", "predict"), node[5:])
+            for t in terminals
+        ],
+    )
+    return True
+
+
+def delete_production(db: sqlite3.Connection, pid: int) -> None:
+    db.execute(
+        "DELETE FROM node_sets WHERE node IN"
+        " (SELECT id FROM nodes WHERE production = ?)",
+        (pid,),
+    )
+    db.execute("DELETE FROM nodes WHERE production = ?", (pid,))
+    db.execute("DELETE FROM productions WHERE id = ?", (pid,))
+
+
+def update_symbol_sets(
+    db: sqlite3.Connection, state: State, ids: Dict[str, int]
+) -> None:
+    # FIRST and FOLLOW of the nonterminals, changing only rows that differ
+    new: Set[Tuple[int, str, int]] = set()
+    for nt in state.nonterms:
+        for kind, terminals in (
+            ("first", state.syms_first[nt].get_value()),
+            ("follow", state.syms_follow[nt].get_value()),
+        ):
+            new |= set((ids[nt], kind, ids[t]) for t in terminals)
+    old: Set[Tuple[int, str, int]] = set(db.execute("SELECT * FROM symbol_sets"))
+    db.executemany(
+        "DELETE FROM symbol_sets WHERE symbol = ? AND kind = ? AND terminal = ?",
+        sorted(old - new),
+    )
+    db.executemany("INSERT INTO symbol_sets VALUES (?, ?, ?)", sorted(new - old))
+
+
+def write(spec: Spec, state: State, path: str) -> Dict[str, int]:
+    # create or update the database at path, in one transaction; returns how
+    # many productions were written, kept, and deleted
+    db = sqlite3.connect(path)
+    try:
+        with db:
+            db.executescript(SCHEMA)
+            ids: Dict[str, int] = symbol_ids(db, state)
+            old: Dict[str, Tuple[int, str]] = {
+                name: (pid, digest)
+                for pid, name, digest in db.execute(
+                    "SELECT productions.id, name, digest FROM productions"
+                    " JOIN symbols ON symbols.id = lhs"
+                )
+            }
+            written: int = 0
+            for position, p in enumerate(spec.productions):
+                written += update_production(
+                    db, p, position, ids, old.pop(p.lhs, None)
+                )
+            for pid, _ in old.values():
+                delete_production(db, pid)
+            update_symbol_sets(db, state, ids)
+            names: Set[str] = state.terms | state.nonterms | {"EOF"}
+            db.executemany(
+                "DELETE FROM symbols WHERE id = ?",
+                [(i,) for name, i in ids.items() if name not in names],
+            )
+    finally:
+        db.close()
+    return {
+        "written": written,
+        "kept": len(spec.productions) - written,
+        "deleted": len(old),
+    }
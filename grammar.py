@@ -25,6 +25,8 @@ class Expr:
     nullable: bool = False
     follow: set[str] = set()
     predict: set[str]
+    # the next tokens that choose this expression where predict overlaps
+    lookahead: Optional[set[tuple[str, ...]]] = None
 
     # code generation directives
     name: Optional[str] = None
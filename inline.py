@@ -0,0 +1,256 @@
+import dataclasses
+from typing import Dict, List, Optional, Set
+
+from . import ir
+from . import pycode
+
+
+def walk(stmts: List[ir.Stmt]):
+    for s in stmts:
+        yield s
+        match s:
+            case ir.Sequence(_, body):
+                yield from walk(body)
+            case ir.Loop(_, body, _):
+                yield from walk(body)
+            case ir.SelectAlternative(guardeds, _):
+                for g in guardeds:
+                    yield from walk(g.body)
+
+
+def size(stmts: List[ir.Stmt]) -> int:
+    return sum(
+        1
+        for s in walk(stmts)
+        if not isinstance(
+            s, (ir.Comment, ir.Verbose, ir.Warning, ir.Empty, ir.Sequence)
+        )
+    )
+
+
+def callees(stmts: List[ir.Stmt]) -> Set[str]:
+    result: Set[str] = set()
+    for s in walk(stmts):
+        match s:
+            case ir.NonTerminal(_, nonterm):
+                result.add(nonterm)
+            case ir.Climb(_, ladder, _):
+                result.add(f"{ladder}__climb")
+    return result
+
+
+def local_names(stmts: List[ir.Stmt]) -> Set[str]:
+    result: Set[str] = set()
+    for s in walk(stmts):
+        match s:
+            case ir.Sequence(decls, _):
+                result.update(d.name for d in decls)
+            case ir.Copy(lhs, rhs):
+                result.add(lhs)
+                result.update(pycode.assigned(rhs))
+            case ir.Terminal(lhs, _) | ir.NonTerminal(lhs, _) | ir.Climb(lhs, _, _):
+                if lhs:
+                    result.add(lhs)
+            case ir.AssignNull(lhs) | ir.AssignEmptyList(lhs):
+                result.add(lhs)
+            case ir.AppendToList(lhs, value):
+                result.update((lhs, value))
+            case ir.Corn(value):
+                result.update(pycode.assigned(value))
+            case ir.Return(value):
+                if value:
+                    result.add(value)
+    return result
+
+
+def all_names(stmts: List[ir.Stmt]) -> Set[str]:
+    result: Set[str] = local_names(stmts)
+    for s in walk(stmts):
+        match s:
+            case ir.Copy(_, code) | ir.Corn(code):
+                result.update(pycode.names(code))
+    return result
+
+
+def escapes(stmts: List[ir.Stmt], in_loop: bool = False) -> bool:
+    # a break or continue that would bind to a loop of the caller
+    for s in stmts:
+        match s:
+            case ir.Break() | ir.Continue():
+                if not in_loop:
+                    return True
+            case ir.Sequence(_, body):
+                if escapes(body, in_loop):
+                    return True
+            case ir.Loop(_, body, _):
+                if escapes(body, True):
+                    return True
+            case ir.SelectAlternative(guardeds, _):
+                if any(escapes(g.body, in_loop) for g in guardeds):
+                    return True
+    return False
+
+
+def rename_stmt(s: ir.Stmt, m: Dict[str, str]) -> ir.Stmt:
+    def r(name: str) -> str:
+        return m.get(name, name)
+
+    match s:
+        case ir.Sequence(decls, body):
+            return ir.Sequence(
+                [ir.Decl(r(d.name)) for d in decls], rename_stmts(body, m)
+            )
+        case ir.Copy(lhs, rhs):
+            return ir.Copy(r(lhs), pycode.rename(rhs, m))
+        case ir.Terminal(lhs, term):
+            return ir.Terminal(lhs and r(lhs), term)
+        case ir.NonTerminal(lhs, nonterm):
+            return ir.NonTerminal(lhs and r(lhs), nonterm)
+        case ir.Climb(lhs, ladder, level):
+            return ir.Climb(lhs and r(lhs), ladder, level)
+        case ir.Loop(top, body, bottom):
+            return ir.Loop(top, rename_stmts(body, m), bottom)
+        case ir.SelectAlternative(guardeds, _):
+            return dataclasses.replace(
+                s,
+                guardeds=[
+                    ir.Guarded(g.guard, rename_stmts(g.body, m)) for g in guardeds
+                ],
+            )
+        case ir.Corn(value):
+            return ir.Corn(pycode.rename(value, m))
+        case ir.AssignNull(lhs):
+            return ir.AssignNull(r(lhs))
+        case ir.AssignEmptyList(lhs):
+            return ir.AssignEmptyList(r(lhs))
+        case ir.AppendToList(lhs, value):
+            return ir.AppendToList(r(lhs), r(value))
+        case ir.Return(value):
+            return ir.Return(value and r(value))
+        case _:
+            return s
+
+
+def rename_stmts(stmts: List[ir.Stmt], m: Dict[str, str]) -> List[ir.Stmt]:
+    return [rename_stmt(s, m) for s in stmts]
+
+
+class Inliner:
+    def __init__(self, program: ir.Program, threshold: int):
+        self.program: ir.Program = program
+        self.threshold: int = threshold
+        self.functions: Dict[str, ir.Function] = {
+            f.name: f for f in program.functions
+        }
+        self.graph: Dict[str, Set[str]] = {
+            f.name: callees(f.body) for f in program.functions
+        }
+        for l in program.ladders:
+            self.graph[f"{l.name}__climb"] = set(
+                [l.primary] + [r.rest for r in l.rungs]
+            )
+        self.expanded: Dict[str, List[ir.Stmt]] = {}
+        self.inlinable: Set[str] = set(
+            f.name for f in program.functions if self.can_inline(f)
+        )
+
+    def recursive(self, name: str) -> bool:
+        seen: Set[str] = set()
+        work: List[str] = list(self.graph[name])
+        while work:
+            n = work.pop()
+            if n == name:
+                return True
+            if n in seen or n not in self.graph:
+                continue
+            seen.add(n)
+            work.extend(self.graph[n])
+        return False
+
+    def can_inline(self, f: ir.Function) -> bool:
+        if f.params or size(f.body) > self.threshold:
+            return False
+        returns = [s for s in walk(f.body) if isinstance(s, ir.Return)]
+        if returns and (len(returns) > 1 or f.body[-1] is not returns[0]):
+            return False
+        if escapes(f.body):
+            return False
+        for s in walk(f.body):
+            match s:
+                case ir.Copy(_, code) | ir.Corn(code):
+                    if not pycode.valid(code):
+                        return False
+        return not self.recursive(f.name)
+
+    def expand(self, name: str) -> List[ir.Stmt]:
+        if name not in self.expanded:
+            self.expanded[name] = self.stmts(self.functions[name].body, None)
+        return self.expanded[name]
+
+    def fresh(self, callee: str, taken: Set[str]) -> Dict[str, str]:
+        body: List[ir.Stmt] = self.expand(callee)
+        names: Set[str] = local_names(body)
+        k = 0
+        while any(f"_{callee}{k}_{n}" in taken for n in names):
+            k += 1
+        m: Dict[str, str] = {n: f"_{callee}{k}_{n}" for n in names}
+        taken.update(m.values())
+        return m
+
+    def substitute(
+        self, call: ir.NonTerminal, taken: Set[str]
+    ) -> List[ir.Stmt]:
+        body: List[ir.Stmt] = self.expand(call.nonterm)
+        m: Dict[str, str] = self.fresh(call.nonterm, taken)
+        result: ir.Sequence = ir.Sequence([], [])
+        for s in rename_stmts(body, m):
+            match s:
+                case ir.Return(value):
+                    if call.lhs and value:
+                        copy: Optional[ir.Copy] = ir.mkCopy(call.lhs, value)
+                        if copy:
+                            result.stmts.append(copy)
+                case ir.Comment(message):
+                    result.stmts.append(ir.Comment(f"inline {message}"))
+                case _:
+                    result.stmts.append(s)
+        return [result]
+
+    def stmts(
+        self, stmts: List[ir.Stmt], taken: Optional[Set[str]]
+    ) -> List[ir.Stmt]:
+        if taken is None:
+            taken = all_names(stmts)
+        result: List[ir.Stmt] = []
+        for s in stmts:
+            match s:
+                case ir.NonTerminal(_, nonterm) if nonterm in self.inlinable:
+                    result.extend(self.substitute(s, taken))
+                case ir.Sequence(decls, body):
+                    result.append(ir.Sequence(decls, self.stmts(body, taken)))
+                case ir.Loop(top, body, bottom):
+                    result.append(ir.Loop(top, self.stmts(body, taken), bottom))
+                case ir.SelectAlternative(guardeds, _):
+                    result.append(
+                        dataclasses.replace(
+                            s,
+                            guardeds=[
+                                ir.Guarded(g.guard, self.stmts(g.body, taken))
+                                for g in guardeds
+                            ],
+                        )
+                    )
+                case _:
+                    result.append(s)
+        return result
+
+    def inline(self) -> ir.Program:
+        functions: List[ir.Function] = [
+            dataclasses.replace(f, body=self.stmts(f.body, None))
+            for f in self.program.functions
+        ]
+        return dataclasses.replace(self.program, functions=functions)
+
+
+def inline(program: ir.Program, threshold: int) -> ir.Program:
+    return Inliner(program, threshold).inline()
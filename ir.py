@@ -1,10 +1,13 @@
-from typing import Set, List, Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Set, List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass, field
 
 
 @dataclass
 class Guard:
     predict: Set[str]
+    # where the predict sets of a decision overlap, the next tokens
+    # (all strings have the same length) that choose this guard
+    lookahead: Optional[Set[Tuple[str, ...]]] = None
 
 
 @dataclass
@@ -46,6 +49,13 @@ class NonTerminal(Stmt):
     nonterm: str
 
 
+@dataclass
+class Climb(Stmt):
+    lhs: Optional[str]
+    ladder: str
+    level: int
+
+
 @dataclass
 class Loop(Stmt):
     top: Optional[Guard]
@@ -68,6 +78,7 @@ class ParseError:
 class SelectAlternative(Stmt):
     guardeds: List[Guarded]
     error: Optional[ParseError]
+    label: str = ""
 
 
 @dataclass
@@ -127,6 +138,24 @@ class Return(Stmt):
 class Function:
     name: str
     body: List[Stmt]
+    params: List[str] = field(default_factory=list)
+    follow: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class Rung:
+    nonterm: str
+    ops: Set[str]
+    rest: str
+    opaque: bool
+    body: List[Stmt] = field(default_factory=list)
+
+
+@dataclass
+class Ladder:
+    name: str
+    rungs: List[Rung]
+    primary: str
 
 
 @dataclass
@@ -135,3 +164,6 @@ class Program:
     prologue: List[str]
     functions: List[Function]
     pragmas: Dict[str, Any]
+    ladders: List[Ladder] = field(default_factory=list)
+    # the number of tokens the parser looks at
+    lookahead: int = 1
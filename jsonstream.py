@@ -0,0 +1,50 @@
+import json
+from typing import Any, Iterable, Iterator, TextIO
+
+
+def nested(value: Any, indent: int, level: int) -> str:
+    # json.dumps(value, indent=indent) as it appears level deep in a document
+    text: str = json.dumps(value, indent=indent)
+    if level:
+        text = text.replace("\n", "\n" + " " * (indent * level))
+    return text
+
+
+def write_array(
+    file: TextIO, items: Iterable[Any], indent: int, level: int = 0
+) -> None:
+    # the same text as json.dump(list(items), file, indent=indent), but every
+    # item is written as soon as it is produced, and none is kept
+    pad: str = " " * (indent * (level + 1))
+    empty: bool = True
+    for item in items:
+        file.write(("[\n" if empty else ",\n") + pad)
+        file.write(nested(item, indent, level + 1))
+        empty = False
+    file.write("[]" if empty else "\n" + " " * (indent * level) + "]")
+
+
+def write_object(
+    file: TextIO, fields: Iterable[tuple[str, Any]], indent: int
+) -> None:
+    # the same text as json.dump(dict(fields), file, indent=indent), followed
+    # by a newline; a value that is an iterator is written with write_array,
+    # and a field's value is not looked at before the fields preceding it
+    # have been written
+    pad: str = " " * indent
+    empty: bool = True
+    for key, value in fields:
+        file.write(("{\n" if empty else ",\n") + pad + json.dumps(key) + ": ")
+        if isinstance(value, Iterator):
+            write_array(file, value, indent, 1)
+        else:
+            file.write(nested(value, indent, 1))
+        empty = False
+    file.write("{}\n" if empty else "\n}\n")
+
+
+def write_lines(file: TextIO, items: Iterable[Any]) -> None:
+    # JSON Lines: every item as a line of compact JSON
+    for item in items:
+        file.write(json.dumps(item, separators=(",", ":")))
+        file.write("\n")
@@ -0,0 +1,106 @@
+import dataclasses
+from typing import Dict, List, Optional, Set
+
+from . import ir
+from . import pycode
+from .inline import walk
+
+
+class Liveness:
+    # a name is live if code, a live name or list, or the return of a live
+    # result reads it anywhere in its function; a result is live if the
+    # start symbol or a live name receives it.  A value (= << >>) that
+    # nothing reads is still computed, for its side effects, unless it only
+    # reads variables.
+    def __init__(self, program: ir.Program):
+        self.program: ir.Program = program
+        self.results: Set[str] = {program.start_nonterminal}
+        for l in program.ladders:
+            self.results.update([l.primary] + [r.rest for r in l.rungs])
+            self.results.update(r.nonterm for r in l.rungs)
+        self.live: Dict[str, Set[str]] = {}
+
+    def names(self, f: ir.Function) -> Set[str]:
+        live: Set[str] = set(f.params)
+        while True:
+            before: int = len(live)
+            for s in walk(f.body):
+                match s:
+                    case ir.Corn(code):
+                        live.update(pycode.names(code))
+                    case ir.Copy(lhs, rhs):
+                        if lhs in live or not pycode.pure(rhs):
+                            live.update(pycode.names(rhs))
+                    case ir.AppendToList(lhs, value):
+                        if lhs in live:
+                            live.add(value)
+                    case ir.Return(value):
+                        if value and f.name in self.results:
+                            live.add(value)
+            if len(live) == before:
+                return live
+
+    def analyze(self) -> None:
+        while True:
+            before: int = len(self.results)
+            for f in self.program.functions:
+                self.live[f.name] = self.names(f)
+                for s in walk(f.body):
+                    match s:
+                        case ir.NonTerminal(lhs, nonterm) if lhs in self.live[f.name]:
+                            self.results.add(nonterm)
+            if len(self.results) == before:
+                return
+
+    def stmts(self, stmts: List[ir.Stmt], live: Set[str]) -> List[ir.Stmt]:
+        result: List[ir.Stmt] = []
+        for s in stmts:
+            t: Optional[ir.Stmt] = self.stmt(s, live)
+            if t is not None:
+                result.append(t)
+        return result
+
+    def stmt(self, s: ir.Stmt, live: Set[str]) -> Optional[ir.Stmt]:
+        match s:
+            case ir.Sequence(decls, body):
+                return ir.Sequence(
+                    [d for d in decls if d.name in live], self.stmts(body, live)
+                )
+            case ir.Terminal(lhs, term) if lhs and lhs not in live:
+                return ir.Terminal(None, term)
+            case ir.NonTerminal(lhs, nonterm) if lhs and lhs not in live:
+                return ir.NonTerminal(None, nonterm)
+            case ir.Climb(lhs, ladder, level) if lhs and lhs not in live:
+                return ir.Climb(None, ladder, level)
+            case ir.AssignNull(lhs) | ir.AssignEmptyList(lhs) if lhs not in live:
+                return None
+            case ir.AppendToList(lhs, _) if lhs not in live:
+                return None
+            case ir.Copy(lhs, rhs) if lhs not in live:
+                return None if pycode.pure(rhs) else ir.Corn(rhs)
+            case ir.Return(value) if value and value not in live:
+                return None
+            case ir.Loop(top, body, bottom):
+                return ir.Loop(top, self.stmts(body, live), bottom)
+            case ir.SelectAlternative(guardeds, _):
+                return dataclasses.replace(
+                    s,
+                    guardeds=[
+                        ir.Guarded(g.guard, self.stmts(g.body, live))
+                        for g in guardeds
+                    ],
+                )
+        return s
+
+    def eliminate(self) -> ir.Program:
+        self.analyze()
+        functions: List[ir.Function] = [
+            dataclasses.replace(f, body=self.stmts(f.body, self.live[f.name]))
+            for f in self.program.functions
+        ]
+        return dataclasses.replace(self.program, functions=functions)
+
+
+def eliminate(program: ir.Program) -> ir.Program:
+    # drop the values, lists, and temporaries that nothing reads
+    return Liveness(program).eliminate()
@@ -0,0 +1,114 @@
+import hashlib
+import io
+import linecache
+import sys
+import threading
+from collections import OrderedDict
+from types import CodeType, ModuleType
+from typing import Optional, Tuple
+
+from .artifacts import ArtifactCache
+from .create import Options, generate
+from . import pgo
+
+
+def compile_module(
+    source: str, name: str, code: Optional[CodeType] = None
+) -> ModuleType:
+    filename: str = f"<{name}>"
+    linecache.cache[filename] = (
+        len(source),
+        None,
+        source.splitlines(keepends=True),
+        filename,
+    )
+    module = ModuleType(name)
+    module.__file__ = filename
+    if code is None:
+        code = compile(source, filename, "exec")
+    # dataclasses, typing, and pickle find the module's globals by name
+    sys.modules[name] = module
+    try:
+        exec(code, module.__dict__)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def release(module: ModuleType) -> None:
+    if sys.modules.get(module.__name__) is module:
+        del sys.modules[module.__name__]
+
+
+class ParserCache:
+    def __init__(self, maxsize: int = 64, directory: str = ""):
+        self.maxsize: int = maxsize
+        self.modules: OrderedDict[Tuple[str, Options, str], ModuleType] = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+        self.artifacts: Optional[ArtifactCache] = (
+            ArtifactCache(directory) if directory else None
+        )
+
+    def key(self, grammar: str, options: Options) -> Tuple[str, Options, str]:
+        return (
+            hashlib.sha256(grammar.encode()).hexdigest(),
+            options,
+            pgo.digest(options.profile_data),
+        )
+
+    def load_module(self, grammar: str, options: Options) -> ModuleType:
+        key = self.key(grammar, options)
+        with self.lock:
+            if key in self.modules:
+                self.modules.move_to_end(key)
+                return self.modules[key]
+        module: ModuleType = (
+            self.load_artifact(grammar, options)
+            if self.artifacts
+            else self.generate(grammar, options)
+        )
+        with self.lock:
+            self.modules[key] = module
+            self.modules.move_to_end(key)
+            while len(self.modules) > self.maxsize:
+                release(self.modules.popitem(last=False)[1])
+        return module
+
+    def generate(self, grammar: str, options: Options) -> ModuleType:
+        out = io.StringIO()
+        generate(grammar, out, options)
+        key = self.key(grammar, options)
+        name: str = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+        return compile_module(out.getvalue(), f"rdgen_{name}")
+
+    def load_artifact(self, grammar: str, options: Options) -> ModuleType:
+        assert self.artifacts
+        key: str = self.artifacts.key(grammar, options)
+        source: Optional[str] = self.artifacts.get_source(key)
+        code: Optional[CodeType] = self.artifacts.get_code(key)
+        if source is None or code is None:
+            out = io.StringIO()
+            generate(grammar, out, options)
+            source = out.getvalue()
+            code = self.artifacts.put(key, source)
+        return compile_module(source, f"rdgen_{key[:16]}", code)
+
+    def clear(self) -> None:
+        with self.lock:
+            for module in self.modules.values():
+                release(module)
+            self.modules.clear()
+
+
+cache = ParserCache()
+
+
+def load_module(grammar: str, options: Options = Options()) -> ModuleType:
+    return cache.load_module(grammar, options)
+
+
+def load_parser(grammar: str, options: Options = Options()) -> type:
+    return load_module(grammar, options).Parser
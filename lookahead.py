@@ -0,0 +1,248 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import grammar
+from .analysis import State, noop
+
+# strings of up to k terminals; a string shorter than k ends with EOF
+Strings = Set[Tuple[str, ...]]
+
+
+class Unsupported(Exception):
+    # break, continue, and {* *} do not say what comes next
+    pass
+
+
+def concat(a: Strings, b: Strings, k: int) -> Strings:
+    result: Strings = set()
+    for x in a:
+        if len(x) >= k:
+            result.add(x)
+        else:
+            for y in b:
+                result.add((x + y)[:k])
+    return result
+
+
+def pad(s: Tuple[str, ...], k: int) -> Tuple[str, ...]:
+    # the parser sees EOF again past the end of its input
+    if s and s[-1] == "EOF":
+        return s + ("EOF",) * (k - len(s))
+    return s
+
+
+class Lookahead:
+    # FIRST_k and FOLLOW_k of the nonterminals, computed (as least fixed
+    # points, like the LL(1) sets) only when a production asks for more
+    # than one token of lookahead and has an LL(1) conflict
+    def __init__(self, productions: List[grammar.Production], k: int):
+        self.productions: List[grammar.Production] = productions
+        self.k: int = k
+        self.nonterms: Set[str] = set(p.lhs for p in productions)
+        self.first: Dict[str, Strings] = {nt: set() for nt in self.nonterms}
+        self.follow: Dict[str, Strings] = {nt: set() for nt in self.nonterms}
+        self.unsupported: Set[str] = set()
+        # what follows every expression within its production, and the
+        # production
+        self.rest: Dict[int, Tuple[List[grammar.Expr], str]] = {}
+        self.memo: Optional[Dict[int, Strings]] = None
+        for p in productions:
+            self.continuations(p.rhs, [], p.lhs)
+        self.compute_first()
+        self.compute_follow()
+
+    def continuations(
+        self, e: grammar.Expr, rest: List[grammar.Expr], lhs: str
+    ) -> None:
+        self.rest[id(e)] = (rest, lhs)
+        match e:
+            case grammar.Sequence(seq=seq):
+                self.continuations(seq, rest, lhs)
+            case grammar.Cons(car=car, cdr=cdr):
+                self.continuations(car, [cdr] + rest, lhs)
+                self.continuations(cdr, rest, lhs)
+            case grammar.Parens(e=x) | grammar.Opt(val=x):
+                self.continuations(x, rest, lhs)
+            case grammar.Alts(vals=vals):
+                for v in vals:
+                    self.continuations(v, rest, lhs)
+            case grammar.Rep(val=val) | grammar.Infinite(val=val):
+                self.continuations(val, [e] + rest, lhs)
+            case grammar.OnePlus(val=val):
+                self.continuations(val, [grammar.Rep(val)] + rest, lhs)
+
+    def star(self, f: Strings) -> Strings:
+        result: Strings = {()}
+        while True:
+            more: Strings = {()} | concat(f, result, self.k)
+            if more == result:
+                return result
+            result = more
+
+    def first_of(self, e: grammar.Expr) -> Strings:
+        if self.memo is not None and id(e) in self.memo:
+            return self.memo[id(e)]
+        result: Strings
+        match e:
+            case grammar.Sym(value=v) if v in self.nonterms:
+                if v in self.unsupported:
+                    raise Unsupported(v)
+                result = self.first[v]
+            case grammar.Sym(value=v):
+                result = {(v,)}
+            case grammar.Lambda() | grammar.Value():
+                result = {()}
+            case grammar.Sequence(seq=x) | grammar.Parens(e=x):
+                result = self.first_of(x)
+            case grammar.Cons(car=car, cdr=cdr):
+                result = concat(self.first_of(car), self.first_of(cdr), self.k)
+            case grammar.Alts(vals=vals):
+                result = set()
+                for v in vals:
+                    result |= self.first_of(v)
+            case grammar.Opt(val=val):
+                result = {()} | self.first_of(val)
+            case grammar.Rep(val=val):
+                result = self.star(self.first_of(val))
+            case grammar.OnePlus(val=val):
+                f: Strings = self.first_of(val)
+                result = concat(f, self.star(f), self.k)
+            case _:
+                raise Unsupported(e)
+        if self.memo is not None:
+            self.memo[id(e)] = result
+        return result
+
+    def compute_first(self) -> None:
+        changed: bool = True
+        while changed:
+            changed = False
+            for p in self.productions:
+                if p.lhs in self.unsupported:
+                    continue
+                try:
+                    f: Strings = self.first_of(p.rhs)
+                except Unsupported:
+                    self.unsupported.add(p.lhs)
+                    changed = True
+                    continue
+                if not f <= self.first[p.lhs]:
+                    self.first[p.lhs] |= f
+                    changed = True
+        self.memo = {}
+
+    def follow_of(self, e: grammar.Expr) -> Strings:
+        rest, lhs = self.rest[id(e)]
+        result: Strings = {()}
+        for x in rest:
+            result = concat(result, self.first_of(x), self.k)
+        return concat(result, self.follow[lhs], self.k)
+
+    def compute_follow(self) -> None:
+        self.follow[self.productions[0].lhs] = {("EOF",)}
+        uses: List[grammar.Sym] = []
+
+        def collect(e: grammar.Expr, x: Any) -> None:
+            if isinstance(e, grammar.Sym) and e.value in self.nonterms:
+                uses.append(e)
+
+        for p in self.productions:
+            p.rhs.visit(collect, noop, None)
+        changed: bool = True
+        while changed:
+            changed = False
+            for s in uses:
+                try:
+                    f: Strings = self.follow_of(s)
+                except Unsupported:
+                    continue
+                if not f <= self.follow[s.value]:
+                    self.follow[s.value] |= f
+                    changed = True
+
+    def predict(self, e: grammar.Expr, k: int) -> Strings:
+        # the strings of k tokens that e starts, in its context
+        strings: Strings = concat(self.first_of(e), self.follow_of(e), self.k)
+        return set(pad(s[:k], k) for s in strings)
+
+    def separate(
+        self, choices: List[Strings], conflicts: Set[str], k: int
+    ) -> Optional[int]:
+        # the fewest tokens that tell the choices apart where they conflict
+        for n in range(2, k + 1):
+            seen: Strings = set()
+            for c in choices:
+                mine: Strings = set(s[:n] for s in c if s[0] in conflicts)
+                if seen & mine:
+                    break
+                seen |= mine
+            else:
+                return n
+        return None
+
+
+def decisions(e: grammar.Expr, found: Any) -> None:
+    # the alternatives, options, and repetitions that have LL(1) conflicts
+    match e:
+        case grammar.Alts(vals=vals):
+            seen: Set[str] = set()
+            for v in vals:
+                if seen & v.predict:
+                    found.append(e)
+                    break
+                seen |= v.predict
+        case grammar.Rep(val=val) | grammar.OnePlus(val=val) | grammar.Opt(val=val):
+            if val.first & e.follow and not val.nullable:
+                found.append(e)
+
+
+def resolve(
+    productions: List[grammar.Production],
+    state: State,
+    pragmas: Dict[str, Any],
+) -> None:
+    # "%% name.k = N" lets the decisions of production name look at up to N
+    # tokens
+    ks: Dict[str, int] = {}
+    for lhs, table in pragmas.items():
+        if isinstance(table, dict) and isinstance(table.get("k"), int):
+            ks[lhs] = table.pop("k")
+    found: Dict[str, List[grammar.Expr]] = {}
+    for p in productions:
+        if ks.get(p.lhs, 1) > 1:
+            found[p.lhs] = []
+            p.rhs.visit(decisions, noop, found[p.lhs])
+    if not any(found.values()):
+        return
+    la = Lookahead(productions, max(ks[lhs] for lhs in found))
+    for lhs, exprs in found.items():
+        k: int = ks[lhs]
+        for e in exprs:
+            match e:
+                case grammar.Alts(vals=vals):
+                    counts: Dict[str, int] = {}
+                    for v in vals:
+                        for t in v.predict:
+                            counts[t] = counts.get(t, 0) + 1
+                    conflicts: Set[str] = set(t for t, n in counts.items() if n > 1)
+                    chosen: List[grammar.Expr] = [
+                        v for v in vals if v.predict & conflicts
+                    ]
+                case _:
+                    conflicts = e.val.first & e.follow
+                    chosen = [e.val]
+            try:
+                choices: List[Strings] = [la.predict(c, k) for c in chosen]
+                if not isinstance(e, grammar.Alts):
+                    choices.append(set(pad(s[:k], k) for s in la.follow_of(e)))
+            except Unsupported:
+                state.warnings[e].append(f"AMBIGUOUS: no LL({k}) lookahead here")
+                continue
+            n: Optional[int] = la.separate(choices, conflicts, k)
+            if n is None:
+                state.warnings[e].append(f"AMBIGUOUS: not LL({k})")
+                continue
+            for c, strings in zip(chosen, choices):
+                c.lookahead = set(s[:n] for s in strings if s[0] in conflicts)
+            state.warnings[e] = [
+                w for w in state.warnings[e] if "lookahead" not in w.lower()
+            ] + [f"LL({n}): {n} tokens of lookahead resolve {sorted(conflicts)}"]
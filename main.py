@@ -2,7 +2,7 @@ import argparse
 
 from . import gen_random
 from . import ascending
-from .create import create
+from .create import create, Options
 from .sentences import gen_examples
 from .gen_json import analysis
 
@@ -11,21 +11,46 @@ def main():
     args = parse_args()
     match args.command:
         case "analysis":
-            analysis(args.input, args.output)
+            analysis(args.input, args.output, args.format, args.reprs)
         case "create":
-            create(
-                args.input,
-                args.output,
-                args.verbose,
-                args.decorate,
+            options = Options(
+                verbose=args.verbose,
+                decorate=args.decorate,
+                inline_size=args.inline,
+                stack=args.stack,
+                climb=args.climb,
+                rewrite=args.rewrite_recursion,
+                lazy=args.lazy,
+                profile=args.profile,
+                profile_data=args.profile_data or "",
+                recover=args.recover,
+                validate=args.validate,
+                push=args.push,
+                columnar=args.columnar,
+                ast=args.ast,
+                cst=args.cst,
+                events=args.events,
+                incremental=args.incremental,
+                keep_dead=args.keep_dead,
             )
+            create(args.input, args.output, options=options, cache_dir=args.cache_dir)
         case "examples":
             gen_examples(
-                ascending, args.input, args.output, args.quantity, args.limit
+                ascending,
+                args.input,
+                args.output,
+                args.quantity,
+                args.limit,
+                args.format,
             )
         case "shortest":
             gen_examples(
-                gen_random, args.input, args.output, args.quantity, args.limit
+                gen_random,
+                args.input,
+                args.output,
+                args.quantity,
+                args.limit,
+                args.format,
             )
         case _:
             raise NotImplementedError(args.command)
@@ -40,6 +65,19 @@ def parse_args():
     )
     analysis.add_argument("--input", type=str, help="input file")
     analysis.add_argument("--output", type=str, help="output file")
+    analysis.add_argument(
+        "--format",
+        choices=["json", "jsonl", "compact", "npz", "sqlite"],
+        default="json",
+        help="nested JSON, JSON Lines (a line per production), JSON with tables "
+        "of expressions and sets, NumPy arrays of the predict table and sets "
+        "(needs numpy), or an SQLite database (created or updated)",
+    )
+    analysis.add_argument(
+        "--reprs",
+        action="store_true",
+        help="with --format compact, include the text of every expression",
+    )
 
     create = subparsers.add_parser("create", help="create a parser")
     create.add_argument("--input", type=str, help="input file")
@@ -48,6 +86,95 @@ def parse_args():
         "--verbose", action="store_true", help="verbose output"
     )
     create.add_argument("--decorate", action="store_true", help="decorate")
+    create.add_argument(
+        "--inline",
+        type=int,
+        default=0,
+        metavar="SIZE",
+        help="inline non-recursive productions of at most SIZE statements",
+    )
+    create.add_argument(
+        "--stack",
+        action="store_true",
+        help="parse with an explicit stack instead of recursion",
+    )
+    create.add_argument(
+        "--climb",
+        action="store_true",
+        help="parse operator precedence ladders by precedence climbing",
+    )
+    create.add_argument(
+        "--rewrite-recursion",
+        action="store_true",
+        help="rewrite immediate left and tail right recursion into loops",
+    )
+    create.add_argument(
+        "--lazy",
+        action="store_true",
+        help="compile the methods of the generated parser on first use",
+    )
+    create.add_argument(
+        "--profile",
+        action="store_true",
+        help="count calls, tokens, and time of every production",
+    )
+    create.add_argument(
+        "--profile-data",
+        type=str,
+        metavar="FILE",
+        help="test alternatives in the order of the branch counts in FILE",
+    )
+    create.add_argument(
+        "--recover",
+        action="store_true",
+        help="report all syntax errors, recovering from each",
+    )
+    create.add_argument(
+        "--validate",
+        action="store_true",
+        help="add a validate() method that only checks the input",
+    )
+    create.add_argument(
+        "--push",
+        action="store_true",
+        help="generate a parser that is fed tokens with feed()",
+    )
+    create.add_argument(
+        "--columnar",
+        action="store_true",
+        help="generate a parser whose input is a TokenColumns",
+    )
+    create.add_argument(
+        "--ast",
+        action="store_true",
+        help="build a tree of generated node classes",
+    )
+    create.add_argument(
+        "--cst",
+        action="store_true",
+        help="record the parse as a SyntaxTree of parallel arrays",
+    )
+    create.add_argument(
+        "--events",
+        action="store_true",
+        help="call a handler on entering and exiting productions and on tokens",
+    )
+    create.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reparse edited input, reusing productions the edit did not touch",
+    )
+    create.add_argument(
+        "--keep-dead",
+        action="store_true",
+        help="compute every value, even those nothing reads",
+    )
+    create.add_argument(
+        "--cache-dir",
+        type=str,
+        default="",
+        help="reuse parsers generated earlier from the same grammar and options",
+    )
 
     examples = subparsers.add_parser(
         "examples", help="create a JSON file with example sentences"
@@ -60,6 +187,12 @@ def parse_args():
     examples.add_argument(
         "--limit", type=int, default=100, help="limit on number of iterations"
     )
+    examples.add_argument(
+        "--format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="a JSON array, or JSON Lines (a line per sentence)",
+    )
 
     shortest = subparsers.add_parser(
         "shortest",
@@ -73,6 +206,12 @@ def parse_args():
     shortest.add_argument(
         "--limit", type=int, default=100, help="limit length of sentences"
     )
+    shortest.add_argument(
+        "--format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="a JSON array, or JSON Lines (a line per sentence)",
+    )
 
     return parser.parse_args()
 
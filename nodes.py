@@ -0,0 +1,241 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from .grammar import (
+    Alts,
+    Cons,
+    Expr,
+    Lambda,
+    Loop,
+    Opt,
+    Parens,
+    Production,
+    Sequence,
+    Spec,
+    Sym,
+    Value,
+)
+from .transform import elements
+
+
+@dataclass
+class Node:
+    name: str
+    fields: List[str]
+    types: List[str]
+
+
+# the cell holding an element that is a field, whether it is inside a
+# repetition, and whether it is inside an option or one of several
+# alternatives
+Occurrence = Tuple[Cons, bool, bool]
+
+
+def choices(e: Expr) -> List[Sequence]:
+    match e:
+        case Alts(vals=vals):
+            return vals
+        case Sequence(seq=Cons(car=Alts(vals=vals), cdr=Lambda())):
+            return vals
+        case Sequence():
+            return [e]
+    return []
+
+
+def camel(name: str) -> str:
+    return "".join(w[:1].upper() + w[1:] for w in name.split("_") if w)
+
+
+class Builder:
+    # gives every alternative whose value is not given by the grammar the
+    # value of a node class whose fields are its named elements and its
+    # nonterminals; a field that is repeated is a list of its values, in
+    # order, and one that may be skipped is None then
+    def __init__(self, spec: Spec):
+        self.nonterms: Set[str] = set(p.lhs for p in spec.productions)
+        self.taken: Set[str] = {"Token", "Parser", "ParseErrorException"}
+        self.nodes: List[Node] = []
+        # alternative -> its node, filled in before any type is computed
+        self.classes: Dict[int, Node] = {}
+        self.results: Dict[str, str] = {}
+
+    def fresh(self, name: str) -> str:
+        name = name or "Node"
+        while name in self.taken:
+            name += "_"
+        self.taken.add(name)
+        return name
+
+    def fields(self, s: Sequence) -> Optional[List[Occurrence]]:
+        es: List[Expr] = elements(s)
+        if not es or any(e.keep for e in es):
+            return None
+        if len(es) == 1 and not es[0].name:
+            return None
+        found: List[Occurrence] = []
+        self.occurrences(s, False, False, found)
+        return found
+
+    def occurrences(
+        self, s: Sequence, loop: bool, optional: bool, found: List[Occurrence]
+    ) -> None:
+        # the named elements and nonterminals of a sequence, and those of the
+        # unnamed groups, options, and repetitions in it (but not of an
+        # alternative there that gives its own value); the value of a group,
+        # option, or repetition marked ! is never assigned
+        x = s.seq
+        while isinstance(x, Cons):
+            e: Expr = x.car
+            if (e.name and (isinstance(e, Sym) or not e.simple)) or (
+                isinstance(e, Sym) and e.value in self.nonterms
+            ):
+                found.append((x, loop, optional))
+            elif not e.name:
+                match e:
+                    case Parens(e=body) | Opt(val=body) | Loop(val=body):
+                        seqs: List[Sequence] = choices(body)
+                        for c in seqs:
+                            if any(y.keep for y in elements(c)):
+                                continue
+                            self.occurrences(
+                                c,
+                                loop or isinstance(e, Loop),
+                                optional or isinstance(e, Opt) or len(seqs) > 1,
+                                found,
+                            )
+            x = x.cdr
+
+    def assign(self, name: str, seqs: List[Sequence]) -> None:
+        wanted: List[Sequence] = [s for s in seqs if self.fields(s) is not None]
+        for k, s in enumerate(seqs):
+            for e in elements(s):
+                self.nested(name, e)
+            if s not in wanted:
+                continue
+            cls: str = camel(name) + (str(k + 1) if len(wanted) > 1 else "")
+            node = Node(self.fresh(cls), [], [])
+            self.classes[id(s)] = node
+            self.nodes.append(node)
+
+    def nested(self, name: str, e: Expr) -> None:
+        # the body of a named group, option, or repetition is described by
+        # classes of its own, named after the field
+        match e:
+            case Parens(e=body) | Opt(val=body) | Loop(val=body) if (
+                e.name and not e.simple
+            ):
+                self.assign(f"{name}_{e.name}", choices(body))
+            case Parens(e=body) | Opt(val=body) | Loop(val=body):
+                for s in choices(body):
+                    for x in elements(s):
+                        self.nested(name, x)
+
+    def result(self, seqs: List[Sequence]) -> str:
+        types: Set[str] = set()
+        for s in seqs:
+            es: List[Expr] = elements(s)
+            if id(s) in self.classes:
+                types.add(self.classes[id(s)].name)
+            elif len(es) == 1:
+                types.add(self.type_of(es[0]))
+            else:
+                types.add("Any")
+        return types.pop() if len(types) == 1 else "Any"
+
+    def type_of(self, e: Expr) -> str:
+        match e:
+            case Sym(value=v) if v in self.nonterms:
+                return self.results.get(v, "Any")
+            case Sym():
+                return "Token"
+            case Parens(e=body):
+                return self.result(choices(body))
+            case Opt(val=body):
+                t: str = self.result(choices(body))
+                return "Any" if t == "Any" else f"Optional[{t}]"
+            case Loop(val=body):
+                return f"list[{self.result(choices(body))}]"
+        return "Any"
+
+    def fill(self, seqs: List[Sequence]) -> None:
+        for s in seqs:
+            node: Optional[Node] = self.classes.get(id(s))
+            for e in elements(s):
+                match e:
+                    case Parens(e=body) | Opt(val=body) | Loop(val=body):
+                        self.fill(choices(body))
+            if node is None:
+                continue
+            found: List[Occurrence] = self.fields(s) or []
+            for cell, _, _ in found:
+                # an element alone in an option or group would otherwise
+                # give its value to the option or group
+                if not cell.car.name:
+                    cell.car.name = cell.car.value
+            names: List[str] = [cell.car.name for cell, _, _ in found]
+            args: List[str] = []
+            inits: List[Value] = []
+            for field in dict.fromkeys(names):
+                mine: List[Occurrence] = [
+                    o for o, name in zip(found, names) if name == field
+                ]
+                types: Set[str] = set(self.type_of(cell.car) for cell, _, _ in mine)
+                t: str = types.pop() if len(types) == 1 else "Any"
+                node.fields.append(field)
+                if len(mine) > 1 or mine[0][1]:
+                    # repeated elements are collected in order
+                    var: str = f"{field}_list_"
+                    inits.append(Value(f"{var} = []"))
+                    for cell, _, _ in mine:
+                        cell.cdr = Cons(Value(f"{var}.append({field})"), cell.cdr)
+                    node.types.append(f"list[{t}]")
+                    args.append(var)
+                    continue
+                if mine[0][2]:
+                    inits.append(Value(f"{field} = None"))
+                    t = "Any" if t == "Any" else f"Optional[{t}]"
+                node.types.append(t)
+                args.append(field)
+            for init in reversed(inits):
+                s.seq = Cons(init, s.seq)
+            value = Value(f"{node.name}({', '.join(args)})")
+            value.keep = True
+            x = s.seq
+            while isinstance(x, Cons) and not isinstance(x.cdr, Lambda):
+                x = x.cdr
+            if isinstance(x, Cons):
+                x.cdr = Cons(value, x.cdr)
+            else:
+                s.seq = Cons(value, x)
+
+    def build(self, productions: List[Production]) -> None:
+        for p in productions:
+            self.assign(p.lhs, choices(p.rhs))
+        for p in productions:
+            seqs: List[Sequence] = choices(p.rhs)
+            if len(seqs) == 1 and id(seqs[0]) in self.classes:
+                self.results[p.lhs] = self.classes[id(seqs[0])].name
+        for p in productions:
+            self.fill(choices(p.rhs))
+
+    def source(self) -> str:
+        lines: List[str] = [
+            "from dataclasses import dataclass",
+            "from typing import Any, Optional",
+        ]
+        for node in self.nodes:
+            lines += ["", "", "@dataclass(slots=True)", f"class {node.name}:"]
+            for field, t in zip(node.fields, node.types):
+                t = t if t in ("Any", "Token") else f'"{t}"'
+                lines.append(f"    {field}: {t}")
+            if not node.fields:
+                lines.append("    pass")
+        return "\n".join(lines)
+
+
+def add_nodes(spec: Spec, pragmas: Dict[str, Dict[str, str]]) -> None:
+    builder = Builder(spec)
+    builder.build(spec.productions)
+    spec.preamble.append(builder.source())
+    for lhs, name in builder.results.items():
+        pragmas.setdefault(lhs, {}).setdefault("return", f'"{name}"')
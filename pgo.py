@@ -0,0 +1,74 @@
+import dataclasses
+import hashlib
+import json
+from typing import Dict, List
+
+from . import ir
+
+# branch counts recorded by a parser generated with --profile:
+#     {label: {guard: count}}
+# where the label names a SelectAlternative ("production:k") and the guard
+# is the space separated, sorted predict set of one of its alternatives,
+# followed for an LL(k) guard by " | " and its sorted token strings,
+# separated by ", "
+Counts = Dict[str, Dict[str, int]]
+
+
+def guard_key(guard: ir.Guard) -> str:
+    key: str = " ".join(sorted(guard.predict))
+    if guard.lookahead:
+        key += " | " + ", ".join(sorted(" ".join(s) for s in guard.lookahead))
+    return key
+
+
+def load(path: str) -> Counts:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def digest(path: str) -> str:
+    if not path:
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def disjoint(guardeds: List[ir.Guarded]) -> bool:
+    seen: set[str] = set()
+    for g in guardeds:
+        if seen & g.guard.predict:
+            return False
+        seen |= g.guard.predict
+    return True
+
+
+def reorder_stmts(stmts: List[ir.Stmt], counts: Counts) -> List[ir.Stmt]:
+    result: List[ir.Stmt] = []
+    for s in stmts:
+        match s:
+            case ir.Sequence(decls, body):
+                result.append(ir.Sequence(decls, reorder_stmts(body, counts)))
+            case ir.Loop(top, body, bottom):
+                result.append(ir.Loop(top, reorder_stmts(body, counts), bottom))
+            case ir.SelectAlternative(guardeds, _):
+                guardeds = [
+                    ir.Guarded(g.guard, reorder_stmts(g.body, counts))
+                    for g in guardeds
+                ]
+                # with overlapping predict sets (an LL(1) conflict) the first
+                # alternative wins, so the order is part of the meaning
+                if s.label in counts and disjoint(guardeds):
+                    hits: Dict[str, int] = counts[s.label]
+                    guardeds.sort(key=lambda g: -hits.get(guard_key(g.guard), 0))
+                result.append(dataclasses.replace(s, guardeds=guardeds))
+            case _:
+                result.append(s)
+    return result
+
+
+def reorder(program: ir.Program, counts: Counts) -> ir.Program:
+    functions: List[ir.Function] = [
+        dataclasses.replace(f, body=reorder_stmts(f.body, counts))
+        for f in program.functions
+    ]
+    return dataclasses.replace(program, functions=functions)
@@ -0,0 +1,172 @@
+import ast
+import io
+import keyword
+import tokenize
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def _tokens(code: str) -> List[tokenize.TokenInfo]:
+    return list(tokenize.generate_tokens(io.StringIO(code).readline))
+
+
+def _offsets(code: str) -> List[int]:
+    starts: List[int] = [0, 0]
+    for line in code.splitlines(keepends=True):
+        starts.append(starts[-1] + len(line))
+    return starts
+
+
+def _variables(code: str) -> List[tokenize.TokenInfo]:
+    # NAME tokens that denote variables: not keywords, attributes, or
+    # keyword arguments
+    result: List[tokenize.TokenInfo] = []
+    toks = _tokens(code)
+    depth = 0
+    for i, t in enumerate(toks):
+        if t.type == tokenize.OP and t.string in "([{":
+            depth += 1
+        elif t.type == tokenize.OP and t.string in ")]}":
+            depth -= 1
+        if t.type != tokenize.NAME or keyword.iskeyword(t.string):
+            continue
+        if i > 0 and toks[i - 1].type == tokenize.OP and toks[i - 1].string == ".":
+            continue
+        if (
+            depth > 0
+            and i + 1 < len(toks)
+            and toks[i + 1].type == tokenize.OP
+            and toks[i + 1].string == "="
+        ):
+            continue
+        result.append(t)
+    return result
+
+
+def _tree(code: str) -> Optional[ast.AST]:
+    try:
+        return ast.parse(code)
+    except SyntaxError:
+        return None
+
+
+def _identifiers(tree: ast.AST) -> List[ast.AST]:
+    # the variables and parameters of parsed code, including those in
+    # f-strings (which tokenize sees as single STRING tokens)
+    return [n for n in ast.walk(tree) if isinstance(n, (ast.Name, ast.arg))]
+
+
+def _identifier(n: ast.AST) -> str:
+    return n.id if isinstance(n, ast.Name) else n.arg  # type: ignore
+
+
+def names(code: str) -> Set[str]:
+    tree: Optional[ast.AST] = _tree(code)
+    if tree is None:
+        # a fragment that is not Python by itself
+        return set(t.string for t in _variables(code))
+    return set(_identifier(n) for n in _identifiers(tree))
+
+
+def assigned(code: str) -> Set[str]:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    return set(
+        n.id
+        for n in ast.walk(tree)
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)
+    )
+
+
+def pure(code: str) -> bool:
+    # whether evaluating the expression code can do no more than read
+    # variables and build values from them
+    tree: Optional[ast.AST] = _tree(code)
+    if not isinstance(tree, ast.Module) or len(tree.body) != 1:
+        return False
+    if not isinstance(tree.body[0], ast.Expr):
+        return False
+    return all(
+        isinstance(
+            n,
+            (
+                ast.Expr,
+                ast.Name,
+                ast.Constant,
+                ast.Attribute,
+                ast.Tuple,
+                ast.List,
+                ast.Dict,
+                ast.Set,
+                ast.JoinedStr,
+                ast.FormattedValue,
+                ast.expr_context,
+            ),
+        )
+        for n in ast.walk(tree.body[0])
+    )
+
+
+class _Renamer(ast.NodeTransformer):
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping: Dict[str, str] = mapping
+
+    def visit_Name(self, n: ast.Name) -> ast.Name:
+        n.id = self.mapping.get(n.id, n.id)
+        return n
+
+    def visit_arg(self, n: ast.arg) -> ast.arg:
+        n.arg = self.mapping.get(n.arg, n.arg)
+        return n
+
+
+def rename(code: str, mapping: Dict[str, str]) -> str:
+    tree: Optional[ast.AST] = _tree(code)
+    if tree is None:
+        return _rename_tokens(code, mapping)
+    # edit the names where ast found them, keeping the rest of the text
+    lines: List[bytes] = [line.encode() for line in code.splitlines(keepends=True)]
+    starts: List[int] = _offsets(code)
+
+    def offset(line: int, column: int) -> int:
+        return starts[line] + len(lines[line - 1][:column].decode())
+
+    edits: List[Tuple[int, int, str]] = []
+    for n in _identifiers(tree):
+        name: str = _identifier(n)
+        if name not in mapping:
+            continue
+        begin: int = offset(n.lineno, n.col_offset)  # type: ignore
+        if isinstance(n, ast.arg):
+            end: int = begin + len(name)
+        else:
+            end = offset(n.end_lineno, n.end_col_offset)  # type: ignore
+        if code[begin:end] != name:
+            # positions that do not point at the name: rewrite the code
+            return ast.unparse(_Renamer(mapping).visit(tree))
+        edits.append((begin, end, mapping[name]))
+    for begin, end, new in sorted(edits, reverse=True):
+        code = code[:begin] + new + code[end:]
+    return code
+
+
+def _rename_tokens(code: str, mapping: Dict[str, str]) -> str:
+    starts: List[int] = _offsets(code)
+    edits: List[Tuple[int, int, str]] = []
+    for t in _variables(code):
+        if t.string in mapping:
+            begin: int = starts[t.start[0]] + t.start[1]
+            end: int = starts[t.end[0]] + t.end[1]
+            edits.append((begin, end, mapping[t.string]))
+    for begin, end, new in reversed(edits):
+        code = code[:begin] + new + code[end:]
+    return code
+
+
+def valid(code: str) -> bool:
+    try:
+        _tokens(code)
+    except (tokenize.TokenError, SyntaxError, IndentationError):
+        return False
+    return True
@@ -5,18 +5,28 @@ from . import scanner
 from .parse import Parser
 from .grammar import Spec, Production
 from . import analysis
+from . import lookahead
+from . import transform
+from . import nodes
 
 
-def process_grammar(input: str) -> Tuple[Spec, analysis.State, Dict[str, Any]]:
+def process_grammar(
+    input: str, rewrite: bool = False, ast: bool = False
+) -> Tuple[Spec, analysis.State, Dict[str, Any]]:
     lexer = scanner.Scanner(input)
     p = Parser(lexer.tokens)
     spec: Spec = p.parse()
+    if rewrite:
+        spec.productions = transform.eliminate_recursion(spec.productions)
 
     concatenated = "\n".join(spec.pragmas)
     toml: Dict[str, Any] = tomllib.loads(concatenated)
+    if ast:
+        nodes.add_nodes(spec, toml)
 
     g: list[Production] = spec.productions
 
     state: analysis.State = analysis.analysis(g)
+    lookahead.resolve(g, state, toml)
 
     return spec, state, toml
@@ -1,13 +1,28 @@
 from types import ModuleType
+from typing import Iterator, TextIO
 import sys
-import json
 
 
 from .read import process_grammar
+from .jsonstream import write_array, write_lines
+
+
+def write(f: TextIO, sentences: Iterator[str], format: str) -> None:
+    # every sentence is written as soon as it is generated
+    if format == "jsonl":
+        write_lines(f, sentences)
+    else:
+        write_array(f, sentences, 2)
+        f.write("\n")
 
 
 def gen_examples(
-    ns: ModuleType, input: str, outfile: str, quantity: int, limit: int
+    ns: ModuleType,
+    input: str,
+    outfile: str,
+    quantity: int,
+    limit: int,
+    format: str = "json",
 ) -> None:
     if input:
         with open(input, "r") as f:
@@ -15,10 +30,9 @@ def gen_examples(
     else:
         input = sys.stdin.read()
     g, state, _ = process_grammar(input)
-    L = ns.gen_examples(g, state, quantity, limit)
-    js = json.dumps(L, indent=2) + "\n"
+    sentences: Iterator[str] = ns.gen_examples(g.productions, state, quantity, limit)
     if outfile:
         with open(outfile, "w") as f:
-            f.write(js)
+            write(f, sentences, format)
     else:
-        sys.stdout.write(js)
+        write(sys.stdout, sentences, format)
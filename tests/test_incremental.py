@@ -0,0 +1,79 @@
+import random
+from typing import List
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+expr: term'a { ( "+" | "-" )'op term'b << a = (op.kind, a, b) >> } =<< a >> .
+term: atom'a { "*" atom'b << a = ("*", a, b) >> } =<< a >> .
+atom: NUM'n =<< n.value >> | "(" expr'e ")" =<< e >> .
+"""
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = [
+        Token("NUM" if w.isdigit() else "ID" if w.isalpha() else w, w, 1, i)
+        for i, w in enumerate(text.split())
+    ]
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+def fresh(parser_class: type, parser) -> object:
+    return parser_class(list(parser.tokens)).parse()
+
+
+def test_edits_in_a_row_match_a_fresh_parse():
+    Parser = load_module(GRAMMAR, Options(decorate=True, incremental=True)).Parser
+    parser = Parser(tokens("1 - 2 * 3"))
+    assert parser.parse() == ("-", "1", ("*", "2", "3"))
+    for start, end, text in [(1, 2, "*"), (4, 5, "9"), (1, 2, "-")]:
+        parser.edit(start, end, tokens(text)[:-1])
+        assert parser.parse() == fresh(Parser, parser)
+    assert parser.parse() == ("-", "1", ("*", "2", "9"))
+
+
+def test_random_edits_match_a_fresh_parse():
+    Parser = load_module(GRAMMAR, Options(decorate=True, incremental=True)).Parser
+    rng = random.Random(1)
+    parser = Parser(tokens("1 + 2 * 3 - 4"))
+    parser.parse()
+    for _ in range(500):
+        # replace an operand or an operator by one of the same kind, or an
+        # operand by a parenthesized sum
+        n: int = len(parser.tokens) - 1
+        operands = [i for i in range(n) if parser.tokens[i].kind == "NUM"]
+        operators = [i for i in range(n) if parser.tokens[i].kind in "+-*"]
+        if operators and rng.random() < 0.5:
+            i = rng.choice(operators)
+            parser.edit(i, i + 1, tokens(rng.choice("+-*"))[:-1])
+        elif rng.random() < 0.8 or n > 40:
+            i = rng.choice(operands)
+            parser.edit(i, i + 1, tokens(str(rng.randrange(10)))[:-1])
+        else:
+            i = rng.choice(operands)
+            parser.edit(i, i + 1, tokens(f"( {i} + {n} )")[:-1])
+        assert parser.parse() == fresh(Parser, parser)
+
+
+# tail is empty before a call, which it can only tell from an assignment by
+# the second token after the number
+LL2 = """
+<< from rdgen.scanner import Token >>
+%% tail.k = 2
+stmts: { stmt }'ss =<< ss >> .
+stmt: NUM'n tail't =<< (n.value, t) >> | ID'f "(" ")" =<< ("call", f.value) >> .
+tail: ID'x "=" NUM'v =<< (x.value, v.value) >> | =<< None >> .
+"""
+
+
+def test_edits_within_lookahead_reach_match_a_fresh_parse():
+    Parser = load_module(LL2, Options(decorate=True, incremental=True)).Parser
+    parser = Parser(tokens("1 f ( ) 2 g ( )"))
+    parser.parse()
+    edits = [(2, 4, "= 5"), (6, 8, "= 6"), (6, 8, "( )"), (2, 4, "( )")]
+    for start, end, text in edits:
+        parser.edit(start, end, tokens(text)[:-1])
+        assert parser.parse() == fresh(Parser, parser)
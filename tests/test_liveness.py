@@ -0,0 +1,39 @@
+from typing import List
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+# the value of decl is never read
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+<< seen = [] >>
+prog: { decl } =<< len(seen) >> .
+decl: ID'n ";" =<< seen.append(n.value) >> | NUM'm "." =<< f"<{m.value}>" >> .
+"""
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = []
+    for i, w in enumerate(text.split()):
+        kind: str = "NUM" if w.isdigit() else "ID" if w.isalpha() else w
+        result.append(Token(kind, w, 1, i))
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+def test_dead_value_with_side_effects_is_kept():
+    for inline_size in (0, 10):
+        module = load_module(
+            GRAMMAR, Options(decorate=True, inline_size=inline_size)
+        )
+        module.seen.clear()
+        assert module.Parser(tokens("a ; 1 . b ;")).parse() == 2
+        assert module.seen == ["a", "b"]
+
+
+def test_keep_dead_computes_values_nothing_reads():
+    module = load_module(GRAMMAR, Options(decorate=True))
+    assert module.Parser(tokens("5 ."))._decl() is None
+    module = load_module(GRAMMAR, Options(decorate=True, keep_dead=True))
+    assert module.Parser(tokens("5 ."))._decl() == "<5>"
+    assert module.Parser(tokens("a ; 1 . b ;")).parse() == 2
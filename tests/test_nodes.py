@@ -0,0 +1,54 @@
+import re
+from typing import Any, Iterator
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+expr: term { ( "+" | "-" )'op term } .
+term: factor { "*" factor } .
+factor: NUM'num | "(" expr ")" | "-" factor .
+"""
+
+
+def tokens(text: str) -> Iterator[Token]:
+    for m in re.finditer(r"\s*(?:(\d+)|(\S))", text):
+        if m.group(1):
+            yield Token("NUM", m.group(1), 1, m.start(1))
+        else:
+            yield Token(m.group(2), m.group(2), 1, m.start(2))
+    yield Token("EOF", "", 1, len(text))
+
+
+def unparse(node: Any) -> str:
+    match type(node).__name__:
+        case "Expr":
+            ops = [op.value for op in node.op]
+            terms = [unparse(t) for t in node.term]
+            return terms[0] + "".join(o + t for o, t in zip(ops, terms[1:]))
+        case "Term":
+            return "*".join(unparse(f) for f in node.factor)
+        case "Factor1":
+            return node.num.value
+        case "Factor2":
+            return f"({unparse(node.expr)})"
+        case "Factor3":
+            return f"-{unparse(node.factor)}"
+    raise TypeError(node)
+
+
+def test_multi_operand_expression_round_trips():
+    parser = load_module(GRAMMAR, Options(ast=True)).Parser
+    for text in ["1*2*3", "1+2-3*4*5", "(1-2)*-(3+4+5)*6", "7"]:
+        tree = parser(tokens(text)).parse()
+        assert unparse(tree) == text
+
+
+def test_repeated_fields_are_lists_in_order():
+    parser = load_module(GRAMMAR, Options(ast=True)).Parser
+    tree = parser(tokens("1*2*3")).parse()
+    assert len(tree.term) == 1
+    assert [f.num.value for f in tree.term[0].factor] == ["1", "2", "3"]
+    assert tree.op == []
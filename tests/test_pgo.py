@@ -0,0 +1,31 @@
+from typing import List
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+%% s.k = 2
+s: ID "=" NUM | ID "(" ")" | NUM .
+"""
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = []
+    for i, w in enumerate(text.split()):
+        kind: str = "NUM" if w.isdigit() else "ID" if w.isalpha() else w
+        result.append(Token(kind, w, 1, i))
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+def test_ll2_alternatives_are_counted_separately():
+    Parser = load_module(GRAMMAR, Options(profile=True)).Parser
+    parser = Parser(tokens("x = 1"))
+    parser.parse()
+    for text in ["x = 2", "f ( )", "3"]:
+        parser.reset(tokens(text))
+        parser.parse()
+    (counts,) = parser.branch_profile().values()
+    assert sorted(counts.values()) == [1, 1, 2]
+    assert len(counts) == 3
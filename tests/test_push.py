@@ -0,0 +1,85 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import pytest
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+expr: term'a { ( "+" | "-" )'op term'b << a = (op.kind, a, b) >> } =<< a >> .
+term: atom'a { "*" atom'b << a = ("*", a, b) >> } =<< a >> .
+atom: NUM'n =<< n.value >> | "(" expr'e ")" =<< e >> | "-" atom'a =<< ("-", a) >> .
+"""
+
+INPUTS = ["1", "1 + 2 * 3", "( 1 - 2 ) * - ( 3 + 4 ) * 5", "- - 1 - 2"]
+ERRORS = ["1 +", "( 1 + 2", "1 2", "* 1", ") ("]
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = [
+        Token("NUM" if w.isdigit() else w, w, 1, i)
+        for i, w in enumerate(text.split())
+    ]
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+async def stream(text: str) -> AsyncIterator[Token]:
+    for token in tokens(text):
+        await asyncio.sleep(0)
+        yield token
+
+
+def feed(module, text: str):
+    parser = module.Parser()
+    for token in tokens(text):
+        if not parser.feed(token):
+            break
+    return parser.result
+
+
+def parsers():
+    return (
+        load_module(GRAMMAR, Options(decorate=True)),
+        load_module(GRAMMAR, Options(decorate=True, push=True)),
+    )
+
+
+def test_feed_matches_pull_parsing():
+    pull, push = parsers()
+    for text in INPUTS:
+        expected = pull.Parser(tokens(text)).parse()
+        assert feed(push, text) == expected
+        assert push.Parser(tokens(text)).parse() == expected
+
+
+def test_feed_async_matches_pull_parsing():
+    pull, push = parsers()
+
+    async def main() -> list:
+        return await asyncio.gather(
+            *(push.Parser().feed_async(stream(text)) for text in INPUTS)
+        )
+
+    expected = [pull.Parser(tokens(text)).parse() for text in INPUTS]
+    assert asyncio.run(main()) == expected
+
+
+def test_feed_rejects_at_the_same_token():
+    pull, push = parsers()
+    for text in ERRORS:
+        with pytest.raises(pull.ParseErrorException) as expected:
+            pull.Parser(tokens(text)).parse()
+        with pytest.raises(push.ParseErrorException) as e:
+            feed(push, text)
+        assert e.value.current == expected.value.current
+        assert e.value.expected == expected.value.expected
+
+
+def test_deep_nesting_is_fed_without_recursion():
+    _, push = parsers()
+    depth: int = 5000
+    text: str = "( " * depth + "1" + " )" * depth + " * 2"
+    assert feed(push, text) == ("*", "1", "2")
@@ -0,0 +1,62 @@
+from typing import List
+
+import pytest
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+stmts: { stmt's ";" } =<< None >> .
+stmt: ID "=" expr | "print" expr .
+expr: term { ( "+" | "-" ) term } .
+term: NUM | ID | "(" expr ")" .
+"""
+
+INPUTS = ["", "x = 1 ;", "print ( x + 2 ) - y ; x = 3 ;"]
+ERRORS = [
+    "x = ;",
+    "x = 1 + ; print 2 ;",
+    "print ( 1 ; y = 2 ;",
+    "x 1 ; y = ) ; print 3 ;",
+    "x = 1",
+]
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = []
+    for i, w in enumerate(text.split()):
+        kind: str = "NUM" if w.isdigit() else w
+        if w.isalpha() and w != "print":
+            kind = "ID"
+        result.append(Token(kind, w, 1, i))
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+def test_recovering_parser_accepts_what_parse_accepts():
+    plain = load_module(GRAMMAR, Options(decorate=True))
+    recover = load_module(GRAMMAR, Options(decorate=True, recover=True))
+    for text in INPUTS:
+        expected = plain.Parser(tokens(text)).parse()
+        assert recover.Parser(tokens(text)).parse() == expected
+
+
+def test_first_recovered_error_is_the_error_parse_raises():
+    plain = load_module(GRAMMAR, Options(decorate=True))
+    recover = load_module(GRAMMAR, Options(decorate=True, recover=True))
+    for text in ERRORS:
+        with pytest.raises(plain.ParseErrorException) as expected:
+            plain.Parser(tokens(text)).parse()
+        with pytest.raises(recover.ParseErrorsException) as e:
+            recover.Parser(tokens(text)).parse()
+        first = e.value.errors[0]
+        assert first.current == expected.value.current
+        assert first.expected == expected.value.expected
+
+
+def test_errors_after_the_first_are_reported():
+    recover = load_module(GRAMMAR, Options(decorate=True, recover=True))
+    with pytest.raises(recover.ParseErrorsException) as e:
+        recover.Parser(tokens("x = ; y = ) ; print 3 ;")).parse()
+    assert [error.current.column for error in e.value.errors] == [2, 5]
@@ -0,0 +1,65 @@
+from typing import List
+
+import pytest
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+expr: term'a { ( "+" | "-" )'op term'b << a = (op.kind, a, b) >> } =<< a >> .
+term: atom'a { "*" atom'b << a = ("*", a, b) >> } =<< a >> .
+atom: NUM'n =<< n.value >> | "(" expr'e ")" =<< e >> | "-" atom'a =<< ("-", a) >> .
+"""
+
+INPUTS = ["1", "1 + 2 * 3", "( 1 - 2 ) * - ( 3 + 4 ) * 5", "- - 1 - 2"]
+ERRORS = ["1 +", "( 1 + 2", "1 2", "* 1", ") ("]
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = [
+        Token("NUM" if w.isdigit() else w, w, 1, i)
+        for i, w in enumerate(text.split())
+    ]
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+def parsers():
+    return (
+        load_module(GRAMMAR, Options(decorate=True)),
+        load_module(GRAMMAR, Options(decorate=True, stack=True)),
+    )
+
+
+def test_stack_parser_matches_recursive_parser():
+    recursive, stack = parsers()
+    for text in INPUTS:
+        expected = recursive.Parser(tokens(text)).parse()
+        assert stack.Parser(tokens(text)).parse() == expected
+
+
+def test_stack_parser_rejects_at_the_same_token():
+    recursive, stack = parsers()
+    for text in ERRORS:
+        with pytest.raises(recursive.ParseErrorException) as expected:
+            recursive.Parser(tokens(text)).parse()
+        with pytest.raises(stack.ParseErrorException) as e:
+            stack.Parser(tokens(text)).parse()
+        assert e.value.current == expected.value.current
+        assert e.value.expected == expected.value.expected
+
+
+def test_deep_nesting_only_needs_the_stack_parser():
+    recursive, stack = parsers()
+    depth: int = 5000
+    text: str = "( " * depth + "1" + " )" * depth + " + 2"
+    with pytest.raises(RecursionError):
+        recursive.Parser(tokens(text)).parse()
+    assert stack.Parser(tokens(text)).parse() == ("+", "1", "2")
+    text = "- " * depth + "1"
+    value = stack.Parser(tokens(text)).parse()
+    for _ in range(depth):
+        assert value[0] == "-"
+        value = value[1]
+    assert value == "1"
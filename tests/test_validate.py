@@ -0,0 +1,50 @@
+from typing import List
+
+from rdgen.create import Options
+from rdgen.load import load_module
+from rdgen.scanner import Token
+
+GRAMMAR = """
+<< from rdgen.scanner import Token >>
+expr: term'a { ( "+" | "-" )'op term'b << a = (op.kind, a, b) >> } =<< a >> .
+term: atom'a { "*" atom'b << a = ("*", a, b) >> } =<< a >> .
+atom: NUM'n =<< n.value >> | "(" expr'e ")" =<< e >> | "-" atom'a =<< ("-", a) >> .
+"""
+
+INPUTS = [
+    "1",
+    "1 + 2 * 3",
+    "( 1 - 2 ) * - ( 3 + 4 ) * 5",
+    "1 +",
+    "( 1 + 2",
+    "1 2",
+    "* 1",
+    ") (",
+    "( ( 1 ) ) )",
+]
+
+
+def tokens(text: str) -> List[Token]:
+    result: List[Token] = [
+        Token("NUM" if w.isdigit() else w, w, 1, i)
+        for i, w in enumerate(text.split())
+    ]
+    return result + [Token("EOF", "", 1, len(result))]
+
+
+def rejected_at(module, text: str):
+    try:
+        module.Parser(tokens(text)).parse()
+    except module.ParseErrorException as e:
+        return e.current
+    return None
+
+
+def test_validate_rejects_where_parse_does():
+    for climb in (False, True):
+        options = Options(decorate=True, validate=True, climb=climb)
+        module = load_module(GRAMMAR, options)
+        for text in INPUTS:
+            assert module.Parser(tokens(text)).validate() == rejected_at(
+                module, text
+            )
@@ -0,0 +1,157 @@
+import copy
+from typing import List, Optional
+
+from .grammar import (
+    Alts,
+    Break,
+    Cons,
+    Continue,
+    Expr,
+    Lambda,
+    OnePlus,
+    Opt,
+    Parens,
+    Production,
+    Rep,
+    Sequence,
+    Sym,
+    Value,
+    mkAlts,
+    mkSequence,
+)
+
+
+def alternatives(p: Production) -> List[Sequence]:
+    match p.rhs:
+        case Sequence(seq=Cons(car=Alts(vals=vals), cdr=Lambda())):
+            return vals
+        case _:
+            return [p.rhs]
+
+
+def elements(s: Sequence) -> List[Expr]:
+    result: List[Expr] = []
+    x = s.seq
+    while isinstance(x, Cons):
+        result.append(x.car)
+        x = x.cdr
+    return result
+
+
+def plain(e: Expr) -> bool:
+    # rewriting changes which values are computed, so only productions
+    # without code generation directives are rewritten
+    found: List[Expr] = []
+
+    def pre(x: Expr, arg: None) -> None:
+        if isinstance(x, (Value, Break, Continue)):
+            found.append(x)
+        elif x.name or x.keep or x.simple:
+            found.append(x)
+
+    def post(x: Expr, arg: None) -> None:
+        pass
+
+    e.visit(pre, post, None)
+    return not found
+
+
+def mentions(e: Expr, nonterm: str) -> bool:
+    found: List[Expr] = []
+
+    def pre(x: Expr, arg: None) -> None:
+        if isinstance(x, Sym) and x.value == nonterm:
+            found.append(x)
+
+    def post(x: Expr, arg: None) -> None:
+        pass
+
+    e.visit(pre, post, None)
+    return bool(found)
+
+
+def group(seqs: List[Sequence]) -> List[Expr]:
+    if len(seqs) == 1:
+        return elements(seqs[0])
+    return [Parens(mkAlts(seqs))]
+
+
+def left(p: Production, alts: List[Sequence]) -> Optional[Production]:
+    # a: a x | a y | b | c .   =>   a: (b | c) { x | y } .
+    recursive: List[Sequence] = []
+    others: List[Sequence] = []
+    for alt in alts:
+        es: List[Expr] = elements(alt)
+        if es and isinstance(es[0], Sym) and es[0].value == p.lhs:
+            if len(es) == 1 or any(mentions(e, p.lhs) for e in es[1:]):
+                return None
+            recursive.append(mkSequence(es[1:]))
+        elif mentions(alt, p.lhs):
+            return None
+        else:
+            others.append(alt)
+    if not recursive or not others:
+        return None
+    loop = Rep(mkAlts(recursive))
+    return Production(p.lhs, mkSequence(group(others) + [loop]))
+
+
+def right(p: Production, alts: List[Sequence]) -> Optional[Production]:
+    # a: x a | y a | b | c .   =>   a: { x | y } (b | c) .
+    recursive: List[Sequence] = []
+    others: List[Sequence] = []
+    for alt in alts:
+        es: List[Expr] = elements(alt)
+        if es and isinstance(es[-1], Sym) and es[-1].value == p.lhs:
+            if len(es) == 1 or any(mentions(e, p.lhs) for e in es[:-1]):
+                return None
+            recursive.append(mkSequence(es[:-1]))
+        elif mentions(alt, p.lhs):
+            return None
+        else:
+            others.append(alt)
+    if not recursive or not others:
+        return None
+    loop = Rep(mkAlts(recursive))
+    return Production(p.lhs, mkSequence([loop] + group(others)))
+
+
+def right_opt(p: Production, alts: List[Sequence]) -> Optional[Production]:
+    # a: x [ y a ] .   =>   a: x { y x } .
+    # a: x [ a ] .     =>   a: {+ x +} .
+    if len(alts) != 1:
+        return None
+    es: List[Expr] = elements(alts[0])
+    if len(es) < 2 or not isinstance(es[-1], Opt):
+        return None
+    head: List[Expr] = es[:-1]
+    if any(mentions(e, p.lhs) for e in head):
+        return None
+    opt: Opt = es[-1]
+    if not isinstance(opt.val, Sequence):
+        return None
+    tail: List[Expr] = elements(opt.val)
+    if not tail or not isinstance(tail[-1], Sym) or tail[-1].value != p.lhs:
+        return None
+    sep: List[Expr] = tail[:-1]
+    if any(mentions(e, p.lhs) for e in sep):
+        return None
+    if not sep:
+        return Production(p.lhs, OnePlus(mkSequence(head)))
+    again: List[Expr] = copy.deepcopy(head)
+    return Production(p.lhs, mkSequence(head + [Rep(mkSequence(sep + again))]))
+
+
+def rewrite(p: Production) -> Production:
+    if not plain(p.rhs):
+        return p
+    alts: List[Sequence] = alternatives(p)
+    for rule in (left, right, right_opt):
+        q: Optional[Production] = rule(p, alts)
+        if q:
+            return q
+    return p
+
+
+def eliminate_recursion(productions: List[Production]) -> List[Production]:
+    return [rewrite(p) for p in productions]